@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Resource Accounting
+Measures what each job's child processes (ffmpeg, ffprobe) cost
+
+Pipelines start their ffmpeg and ffprobe children through run_metered() (a
+drop-in for subprocess.run) or reap them with reap(). Both wait for the child
+with wait4(), which returns that one child's rusage: user and system CPU time
+and peak RSS. Just before the child is reaped, its read/write byte counters
+are read from /proc, and an ffmpeg "speed=" figure is taken from captured
+stderr. Each measurement is charged to the ResourceMeter active in the
+calling context, under the stage the job was in when the child started.
+Children started any other way (e.g. yt-dlp's own merge step) are not
+metered; their time still shows in the stage's wall time.
+"""
+
+import contextvars
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+RESOURCE_LOG = os.environ.get('RESOURCE_LOG', '/downloads/.logs/resources.jsonl')
+
+SPEED_PATTERN = re.compile(rb'speed=\s*([\d.]+)x')
+
+_current = contextvars.ContextVar('resource_meter', default=None)
+_log_lock = threading.Lock()
+
+
+class ResourceMeter:
+    """
+    Per-stage resource usage of one job
+
+    Stages are entered with enter() (pipelines do it through their progress
+    report); child processes are charged to the stage they started in.
+    """
+
+    def __init__(self, job_id=None, kind=None):
+        self.job_id = job_id
+        self.kind = kind
+        self.stage = 'starting'
+        self.started = time.time()
+        self.children = []
+        self._walls = {}
+        self._stage_started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def enter(self, stage):
+        """Switch to `stage`; repeated calls for the same stage are ignored"""
+        with self._lock:
+            if stage == self.stage:
+                return
+            self._close_stage()
+            self.stage = stage
+
+    def _close_stage(self):
+        """Add the time spent in the current stage (caller holds the lock)"""
+        now = time.monotonic()
+        self._walls[self.stage] = self._walls.get(self.stage, 0) + now - self._stage_started
+        self._stage_started = now
+
+    def add_child(self, record):
+        """Charge one finished child process to the job"""
+        with self._lock:
+            self.children.append(record)
+
+    def to_dict(self):
+        """Totals per stage and for the whole job"""
+        with self._lock:
+            walls = dict(self._walls)
+            walls[self.stage] = walls.get(self.stage, 0) + time.monotonic() - self._stage_started
+            children = list(self.children)
+
+        names = dict.fromkeys(list(walls) + [c['stage'] for c in children])
+        stages = {name: summarize(walls.get(name, 0), [c for c in children if c['stage'] == name])
+                  for name in names}
+        return {'stages': stages, 'total': summarize(sum(walls.values()), children)}
+
+
+def summarize(wall, children):
+    """Resource totals of a group of child processes"""
+    reported = [c for c in children if c.get('speed')]
+    # The most CPU-hungry ffmpeg of the stage is the encode worth quoting
+    busiest = max(reported, key=lambda c: c['user'] + c['sys'], default=None)
+    return {
+        'wall': round(wall, 3),
+        'user': round(sum(c['user'] for c in children), 3),
+        'sys': round(sum(c['sys'] for c in children), 3),
+        'max_rss_mb': round(max((c['max_rss_mb'] for c in children), default=0), 1),
+        'bytes_read': sum(c['bytes_read'] or 0 for c in children),
+        'bytes_written': sum(c['bytes_written'] or 0 for c in children),
+        'processes': len(children),
+        'speed': busiest['speed'] if busiest else None,
+    }
+
+
+def read_proc_io(pid):
+    """(rchar, wchar) of a live or not yet reaped process, or (None, None) off Linux"""
+    try:
+        fields = dict(
+            line.split(': ', 1) for line in Path(f'/proc/{pid}/io').read_text().splitlines()
+        )
+        return int(fields['rchar']), int(fields['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _wait_exited(pid, flags=0):
+    """Wait for `pid` to exit without reaping it; False if still running (WNOHANG)"""
+    return os.waitid(os.P_PID, pid, os.WEXITED | os.WNOWAIT | flags) is not None
+
+
+def exited(process):
+    """
+    Whether `process` has exited, without reaping it
+
+    Use instead of Popen.poll() in polling loops, so reap() can still
+    measure the child afterwards.
+    """
+    if process.returncode is not None:
+        return True
+    if not hasattr(os, 'waitid'):
+        return process.poll() is not None
+    try:
+        return _wait_exited(process.pid, os.WNOHANG)
+    except ChildProcessError:
+        return process.poll() is not None
+
+
+def reap(process, meter=None, stage=None, started=None):
+    """
+    Wait for `process` like Popen.wait() and charge its usage to the current meter
+
+    Args:
+        process: A Popen whose child nobody has waited for yet
+        meter, stage, started: Meter, stage and monotonic start time to charge
+            (default: the current meter, its current stage, unknown start)
+
+    Returns:
+        The child's usage record, or None if it was not metered
+    """
+    meter = meter or _current.get()
+    if process.returncode is not None or not meter or not hasattr(os, 'wait4'):
+        process.wait()
+        return None
+
+    io = (None, None)
+    try:
+        if hasattr(os, 'waitid'):
+            # Wait without reaping so /proc still has the child's I/O counters
+            _wait_exited(process.pid)
+            io = read_proc_io(process.pid)
+        _, status, rusage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        process.wait()
+        return None
+    # Popen.wait() (and the with-block exit) return this without waiting again
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    args = process.args if isinstance(process.args, (list, tuple)) else str(process.args).split()
+    record = {
+        'stage': stage or meter.stage,
+        'command': os.path.basename(str(args[0])) if args else '',
+        'wall': round(time.monotonic() - started, 3) if started is not None else None,
+        'user': round(rusage.ru_utime, 3),
+        'sys': round(rusage.ru_stime, 3),
+        # ru_maxrss is kilobytes on Linux
+        'max_rss_mb': round(rusage.ru_maxrss / 1024, 1),
+        'bytes_read': io[0],
+        'bytes_written': io[1],
+        'speed': None,
+    }
+    meter.add_child(record)
+    return record
+
+
+def _read_all(stream, into, index):
+    """Read a pipe to its end (run in a thread per pipe)"""
+    into[index] = stream.read()
+
+
+def run_metered(cmd, check=False, capture_output=False, **kwargs):
+    """
+    subprocess.run() that charges the child to the current meter
+
+    Takes the same arguments as subprocess.run (except input/timeout) and
+    returns a CompletedProcess, raising CalledProcessError with `check`.
+    """
+    meter = _current.get()
+    stage = meter.stage if meter else None
+    if capture_output:
+        kwargs['stdout'] = kwargs['stderr'] = subprocess.PIPE
+    started = time.monotonic()
+    with subprocess.Popen(cmd, **kwargs) as process:
+        outputs = [None, None]
+        readers = [
+            threading.Thread(target=_read_all, args=(stream, outputs, index), daemon=True)
+            for index, stream in enumerate((process.stdout, process.stderr)) if stream is not None
+        ]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        record = reap(process, meter, stage, started)
+    stdout, stderr = outputs
+
+    if record is not None and stderr:
+        data = stderr.encode(errors='ignore') if isinstance(stderr, str) else stderr
+        speeds = SPEED_PATTERN.findall(data)
+        if speeds:
+            record['speed'] = float(speeds[-1])
+    if check and process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+@contextmanager
+def metering(meter):
+    """Charge child processes started in this context to `meter`"""
+    token = _current.set(meter)
+    try:
+        yield meter
+    finally:
+        _current.reset(token)
+
+
+def log_usage(meter, status, extra=None, path=RESOURCE_LOG):
+    """Append a finished job's usage, with every child process, to the JSONL log"""
+    record = dict(extra or {}, job_id=meter.job_id, kind=meter.kind, status=status,
+                  started=meter.started, **meter.to_dict(), children=meter.children)
+    line = (json.dumps(record, default=str) + "\n").encode()
+    try:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with _log_lock:
+            # One O_APPEND write per record keeps lines whole across processes
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+    except OSError as e:
+        print(f"⚠️ Could not write resource log: {e}")
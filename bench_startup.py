@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+Measures how long the CLI takes to start and which imports it pays for
+
+Usage: python bench_startup.py [--runs N] [--python PATH]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+
+# Commands that should never need yt-dlp loaded
+COMMANDS = {
+    'interpreter': ['-c', 'pass'],
+    'run_orig --help': [str(SCRIPT_DIR / 'run_orig.py'), '--help'],
+    'download --help': [str(SCRIPT_DIR / 'download.py'), '--help'],
+}
+
+
+def time_command(python, args, runs):
+    """Run a command `runs` times and return wall times in milliseconds"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([python] + args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def import_profile(python, module, top=10):
+    """Return the slowest cumulative imports reported by -X importtime"""
+    result = subprocess.run(
+        [python, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SCRIPT_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def loads_yt_dlp(python, module):
+    """Check whether importing `module` drags yt_dlp in"""
+    result = subprocess.run(
+        [python, '-c', f"import sys, {module}; print('yt_dlp' in sys.modules)"],
+        cwd=SCRIPT_DIR,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True
+    )
+    return result.stdout.strip() == 'True'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark CLI startup time')
+    parser.add_argument('--runs', '-n', type=int, default=10, help='Runs per command (default: 10)')
+    parser.add_argument('--python', default=sys.executable, help='Interpreter to benchmark (default: this one)')
+    args = parser.parse_args()
+
+    print(f"⏱️ Startup benchmark ({args.runs} runs, {args.python})")
+    for label, cmd in COMMANDS.items():
+        timings = time_command(args.python, cmd, args.runs)
+        print(f"   {label:<20} median {statistics.median(timings):7.1f} ms   "
+              f"min {min(timings):7.1f} ms   max {max(timings):7.1f} ms")
+
+    print("\n📦 Slowest imports for run_orig (cumulative)")
+    for cumulative_us, name in import_profile(args.python, 'run_orig'):
+        print(f"   {cumulative_us / 1000:7.1f} ms  {name}")
+
+    if loads_yt_dlp(args.python, 'run_orig'):
+        print("\n❌ Importing run_orig loads yt_dlp eagerly")
+        sys.exit(1)
+    print("\n✅ yt_dlp is not loaded at startup")
+
+
+if __name__ == "__main__":
+    main()
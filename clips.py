@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Clip extraction helpers
+Cut several clips or chapters out of one source video with a single ffmpeg run
+"""
+
+import csv
+import json
+import re
+import subprocess
+from pathlib import Path
+
+from accounting import run_metered
+from mp4tools import MP4_SUFFIXES, FASTSTART_FLAGS
+
+# Slack (seconds) when matching a segment's start time to its chapter
+SEGMENT_START_TOLERANCE = 0.05
+
+
+def to_seconds(time_str):
+    """Convert time string (HH:MM:SS, MM:SS or seconds) to seconds"""
+    time_str = str(time_str).strip()
+    if not time_str:
+        return None
+    if ':' in time_str:
+        seconds = 0.0
+        for part in time_str.split(':'):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    return float(time_str)
+
+
+def parse_clip_ranges(spec):
+    """
+    Parse a clip list such as "0:10-0:30,1:00-1:20" into (start, end) pairs
+
+    Either side of a range may be left empty ("-0:30" or "1:00-") to mean
+    the beginning or the end of the video.
+
+    Raises:
+        ValueError: if a range is malformed or ends before it starts
+    """
+    if isinstance(spec, str):
+        spec = spec.split(',')
+
+    ranges = []
+    for item in spec:
+        item = item.strip()
+        if not item:
+            continue
+        if '-' not in item:
+            raise ValueError(f"Invalid clip range '{item}' (expected START-END)")
+        start_str, end_str = item.split('-', 1)
+        start = to_seconds(start_str)
+        end = to_seconds(end_str)
+        if start is not None and end is not None and end <= start:
+            raise ValueError(f"Clip range '{item}' ends before it starts")
+        ranges.append((start, end))
+
+    if not ranges:
+        raise ValueError("No clip ranges given")
+    return ranges
+
+
+def cut_clips(input_file, ranges, output_dir=None, base_name=None):
+    """
+    Cut every (start, end) range out of `input_file` in one ffmpeg invocation
+
+    The source is opened and demuxed once and every clip is written as a
+    separate output with stream copy, so the cost no longer grows with the
+    number of clips. MP4 clips are written with faststart.
+
+    Args:
+        input_file: Path to input video
+        ranges: List of (start, end) pairs in seconds (None = open end)
+        output_dir: Directory for the clips (default: next to the input)
+        base_name: File name prefix for the clips (default: input stem)
+
+    Returns:
+        List of clip paths in range order, or None on failure
+    """
+    input_file = Path(input_file)
+    if not input_file.exists():
+        print(f"Error: Input file '{input_file}' not found.")
+        return None
+
+    output_dir = Path(output_dir) if output_dir else input_file.parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+    base_name = base_name or input_file.stem
+
+    cmd = ["ffmpeg", "-y", "-i", str(input_file)]
+    outputs = []
+    for index, (start, end) in enumerate(ranges, 1):
+        output_file = output_dir / f"{base_name}_clip{index:02d}{input_file.suffix}"
+        if start is not None:
+            cmd.extend(["-ss", str(start)])
+        if end is not None:
+            cmd.extend(["-t", str(end - (start or 0))])
+        cmd.extend(["-c", "copy"])
+        if input_file.suffix.lower() in MP4_SUFFIXES:
+            cmd.extend(["-movflags", FASTSTART_FLAGS])
+        cmd.append(str(output_file))
+        outputs.append(output_file)
+
+    print(f"Running: {' '.join(cmd)}")
+
+    try:
+        run_metered(cmd, check=True, capture_output=True)
+        print(f"✅ Wrote {len(outputs)} clips to: {output_dir}")
+        return outputs
+    except subprocess.CalledProcessError as e:
+        print(f"ffmpeg failed: {e}")
+        print(f"stderr: {e.stderr.decode()}")
+        return None
+
+
+def bundle_zip(files, zip_path):
+    """Pack files into a zip archive (stored, video is already compressed)"""
+    import zipfile
+
+    zip_path = Path(zip_path)
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for file in files:
+            archive.write(file, arcname=Path(file).name)
+    return zip_path
+
+
+def safe_file_name(name):
+    """Make a chapter title usable as a file name"""
+    name = re.sub(r'[\\/:*?"<>|\x00-\x1f]', '_', str(name)).strip(' .')
+    return name or 'chapter'
+
+
+def get_chapters(file_path):
+    """Read chapter markers embedded in a media file using ffprobe"""
+    try:
+        result = run_metered(
+            ["ffprobe", "-v", "error", "-show_chapters", "-of", "json", str(file_path)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True
+        )
+    except subprocess.CalledProcessError as e:
+        print(f"Error reading chapters: {e.stderr}")
+        return []
+
+    chapters = []
+    for chapter in json.loads(result.stdout or '{}').get('chapters', []):
+        chapters.append({
+            'start_time': float(chapter['start_time']),
+            'end_time': float(chapter['end_time']),
+            'title': chapter.get('tags', {}).get('title'),
+        })
+    return chapters
+
+
+def split_by_chapters(input_file, chapters, output_dir=None):
+    """
+    Split a video at chapter boundaries in one ffmpeg pass
+
+    Uses the segment muxer with stream copy, so every cut snaps to the
+    first keyframe at or after the chapter start. A chapter that ends before
+    its next keyframe gets no part of its own; its content stays in the
+    previous part.
+
+    Args:
+        input_file: Path to input video
+        chapters: yt-dlp style chapter dicts with 'start_time' and 'title'
+        output_dir: Directory for the parts (default: next to the input)
+
+    Returns:
+        List of part paths named after the chapters, or None on failure
+    """
+    input_file = Path(input_file)
+    if not input_file.exists():
+        print(f"Error: Input file '{input_file}' not found.")
+        return None
+    if not chapters:
+        print("Error: Video has no chapters.")
+        return None
+
+    output_dir = Path(output_dir) if output_dir else input_file.parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+    chapters = sorted(chapters, key=lambda c: c['start_time'])
+    # '%' is reserved for the segment number, so escape it in the directory too
+    pattern = str(output_dir).replace('%', '%%') + f"/part%03d{input_file.suffix}"
+    segment_list = output_dir / "segments.csv"
+
+    cmd = ["ffmpeg", "-y", "-i", str(input_file), "-c", "copy", "-f", "segment"]
+    split_points = [str(c['start_time']) for c in chapters[1:]]
+    if split_points:
+        cmd.extend(["-segment_times", ",".join(split_points)])
+    if input_file.suffix.lower() in MP4_SUFFIXES:
+        cmd.extend(["-segment_format_options", f"movflags={FASTSTART_FLAGS}"])
+    cmd.extend(["-segment_list", str(segment_list), "-segment_list_type", "csv"])
+    cmd.extend(["-reset_timestamps", "1", pattern])
+
+    print(f"Running: {' '.join(cmd)}")
+
+    try:
+        run_metered(cmd, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        print(f"ffmpeg failed: {e}")
+        print(f"stderr: {e.stderr.decode()}")
+        return None
+
+    # Name each written segment after the chapter it starts in. A chapter
+    # shorter than a GOP gets no segment of its own (its cut lands in a later
+    # chapter), so going by position would shift every later name.
+    with open(segment_list, newline='') as f:
+        segments = [(output_dir / Path(row[0]).name, float(row[1])) for row in csv.reader(f) if row]
+    segment_list.unlink()
+
+    parts_by_chapter = {}
+    for part, start in segments:
+        if not part.exists():
+            continue
+        # Cuts snap to the first keyframe at or after a chapter start
+        index = max(
+            (i for i, c in enumerate(chapters) if c['start_time'] <= start + SEGMENT_START_TOLERANCE),
+            default=0
+        )
+        parts_by_chapter.setdefault(index, []).append(part)
+
+    outputs = []
+    for index, parts in sorted(parts_by_chapter.items()):
+        title = safe_file_name(chapters[index].get('title') or f"Chapter {index + 1}")
+        named = output_dir / f"{index + 1:02d} - {title}{input_file.suffix}"
+        if len(parts) == 1:
+            parts[0].replace(named)
+        elif not concat_parts(parts, named):
+            return None
+        outputs.append(named)
+
+    print(f"✅ Split into {len(outputs)} chapters in: {output_dir}")
+    return outputs
+
+
+def concat_parts(parts, output_file):
+    """Join consecutive segments of one chapter with stream copy, removing the pieces"""
+    output_file = Path(output_file)
+    concat_list = output_file.parent / "concat.txt"
+    # The concat demuxer resolves relative entries against the list's folder, and needs quotes escaped
+    concat_list.write_text("".join(
+        "file '{}'\n".format(str(part.resolve()).replace("'", "'\\''")) for part in parts
+    ))
+    cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(concat_list), "-c", "copy"]
+    if output_file.suffix.lower() in MP4_SUFFIXES:
+        cmd.extend(["-movflags", FASTSTART_FLAGS])
+    cmd.append(str(output_file))
+
+    try:
+        run_metered(cmd, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        print(f"ffmpeg failed: {e}")
+        print(f"stderr: {e.stderr.decode()}")
+        return False
+    finally:
+        concat_list.unlink(missing_ok=True)
+    for part in parts:
+        part.unlink()
+    return True
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Deduplication
+Recognizes the same source and the same output under different names
+
+- canonical_source turns short links, playlist-context URLs and other
+  spellings of a video URL into one "Extractor:video_id" string, so they
+  share a request key (and a retained output) before any work starts.
+- content_hash fingerprints finished files, so byte-identical outputs that
+  still arrive twice (e.g. from mirrors) are stored once and hardlinked.
+"""
+
+import hashlib
+from functools import lru_cache
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+# Query parameters that only say which playlist a video was opened from
+PLAYLIST_PARAMS = ('list', 'index', 'pp', 'start_radio', 'playnext')
+
+
+@lru_cache(maxsize=4096)
+def canonical_source(url):
+    """
+    Stable identity of the video behind `url`
+
+    Uses the first specific yt-dlp extractor that matches the URL and can
+    read a video id from it without any network access. Playlist context
+    (`list=`, `index=`, ...) is ignored first, since with it the playlist
+    extractor claims the URL and every video of the playlist would share
+    one identity. URLs only the generic extractor understands are returned
+    unchanged.
+    """
+    url = url.strip()
+    # Pure playlist URLs have nothing left once the context is dropped
+    return _extractor_id(strip_playlist_params(url)) or _extractor_id(url) or url
+
+
+def strip_playlist_params(url):
+    """`url` without the query parameters that tie a video to a playlist"""
+    parts = urlsplit(url)
+    query = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+             if name not in PLAYLIST_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _extractor_id(url):
+    """Extractor:video_id string from the first specific extractor that matches, or None"""
+    # Imported here so modules using the store never load yt-dlp up front
+    from yt_dlp.extractor import gen_extractor_classes
+
+    for extractor in gen_extractor_classes():
+        if extractor.ie_key() == 'Generic' or not extractor.suitable(url):
+            continue
+        video_id = extractor.get_temp_id(url)
+        if video_id:
+            return f"{extractor.ie_key()}:{video_id}"
+    return None
+
+
+def content_hash(path, chunk_size=HASH_CHUNK_SIZE):
+    """BLAKE2b digest of a file, read in large chunks into one reused buffer"""
+    digest = hashlib.blake2b(digest_size=32)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+    return digest.hexdigest()
@@ -2,6 +2,9 @@
 """
 YouTube Downloader Wrapper Script
 Simple wrapper that runs run_orig.py from the virtual environment
+
+Runs run_orig in-process when already inside the venv, otherwise execs the
+venv interpreter so only one Python process is ever alive.
 """
 
 import os
@@ -21,13 +24,39 @@ def get_venv_python_path():
     
     return python_exe
 
+def running_in_venv(python_exe):
+    """Check whether this interpreter already is the virtual environment's Python"""
+    venv_path = python_exe.parent.parent
+    try:
+        return Path(sys.prefix).resolve() == venv_path.resolve()
+    except OSError:
+        return False
+
+def run_in_process(script_dir):
+    """Import run_orig and call its main() without starting another interpreter"""
+    sys.path.insert(0, str(script_dir))
+    sys.argv[0] = str(script_dir / "run_orig.py")
+    import run_orig
+    run_orig.main()
+
 def main():
     """Main wrapper function"""
     print("🚀 Starting YouTube Downloader...")
     
-    # Check if virtual environment exists
+    script_dir = Path(__file__).parent.absolute()
     python_exe = get_venv_python_path()
+
+    # Already inside the venv: skip the second interpreter entirely
+    if running_in_venv(python_exe):
+        print("🎬 Running YouTube downloader...")
+        try:
+            run_in_process(script_dir)
+        except KeyboardInterrupt:
+            print("\n⏹️ Script interrupted by user")
+            sys.exit(1)
+        return
     
+    # Check if virtual environment exists
     if not python_exe.exists():
         print("❌ Virtual environment not found!")
         print(f"Expected Python executable at: {python_exe}")
@@ -39,7 +68,6 @@ def main():
         sys.exit(1)
     
     # Get the path to the main script
-    script_dir = Path(__file__).parent.absolute()
     main_script = script_dir / "run_orig.py"
     
     if not main_script.exists():
@@ -50,6 +78,11 @@ def main():
     
     # Prepare the command
     cmd = [str(python_exe), str(main_script)] + sys.argv[1:]
+
+    # Replace this process with the venv interpreter instead of waiting on a child
+    if not sys.platform.startswith('win'):
+        sys.stdout.flush()
+        os.execv(cmd[0], cmd)
     
     try:
         # Run the main script with all arguments passed through
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Encode Policy
+Picks the x264 preset and CRF for each re-encode
+
+The slowest (most efficient) preset that still finishes before the job's
+deadline wins. Encode time is predicted from a calibration table of
+realtime speed factors measured on this host, scaled by the source
+resolution and by how many encodes are already sharing the CPU.
+
+Usage: python encode_policy.py --calibrate [--sample video.mp4]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Fastest to slowest; later presets compress better
+PRESETS = ['ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow', 'slower']
+
+# Realtime speed factors for 1080p on a mid-range 8-core host, used until calibrated
+DEFAULT_SPEEDS = {
+    'ultrafast': 12.0, 'superfast': 9.0, 'veryfast': 6.0, 'faster': 4.0,
+    'fast': 3.0, 'medium': 2.2, 'slow': 1.2, 'slower': 0.6,
+}
+
+CALIBRATION_FILE = Path(os.environ.get('ENCODE_CALIBRATION', '/downloads/.encode_calibration.json'))
+# Without an explicit deadline an encode should finish within this share of the video's length
+DEADLINE_RATIO = float(os.environ.get('ENCODE_DEADLINE_RATIO', '0.5'))
+MIN_DEADLINE = float(os.environ.get('ENCODE_MIN_DEADLINE', '60'))
+# Never go slower than this, however idle the host is
+SLOWEST_PRESET = os.environ.get('ENCODE_SLOWEST_PRESET', 'slow')
+
+REFERENCE_PIXELS = 1920 * 1080
+
+_active_encodes = 0
+_active_lock = threading.Lock()
+
+
+def load_speeds(path=CALIBRATION_FILE):
+    """Calibrated speed factors for this host, falling back to the defaults"""
+    try:
+        speeds = json.loads(Path(path).read_text())['speeds']
+        return {preset: float(speeds[preset]) for preset in PRESETS if preset in speeds}
+    except (OSError, ValueError, KeyError):
+        return dict(DEFAULT_SPEEDS)
+
+
+def active_encodes():
+    """Encodes currently running in this process"""
+    with _active_lock:
+        return _active_encodes
+
+
+@contextmanager
+def encode_slot():
+    """Count an encode as running for the duration of the block; yields the depth before it"""
+    global _active_encodes
+    with _active_lock:
+        depth = _active_encodes
+        _active_encodes += 1
+    try:
+        yield depth
+    finally:
+        with _active_lock:
+            _active_encodes -= 1
+
+
+def crf_for_height(height):
+    """Default CRF by resolution (higher resolutions hide a little more loss)"""
+    if not height or height <= 720:
+        return 22
+    if height <= 1080:
+        return 23
+    return 24
+
+
+def choose_encoding(duration, width=None, height=None, queue_depth=0, deadline=None,
+                    parallelism=1, speeds=None):
+    """
+    Pick (preset, crf) for one encode
+
+    Args:
+        duration: Source duration in seconds
+        width, height: Source resolution (None = assume 1080p)
+        queue_depth: Other encodes sharing the CPU
+        deadline: Seconds the encode may take (None = DEADLINE_RATIO of duration)
+        parallelism: Encoders working on this job at once (chunked encoding)
+        speeds: Speed table (default: calibration file or built-in table)
+
+    Returns:
+        (preset, crf)
+    """
+    speeds = speeds or load_speeds()
+    if deadline is None:
+        deadline = max(MIN_DEADLINE, (duration or 0) * DEADLINE_RATIO)
+
+    pixels = (width or 1920) * (height or 1080)
+    scale = pixels / REFERENCE_PIXELS
+    # Calibrated speeds already use every core; chunking adds roughly sqrt(n)
+    # on top, and other running encodes take their share of the CPU
+    cpu_share = max(1, parallelism) ** 0.5 / (1 + queue_depth)
+    crf = crf_for_height(height)
+
+    slowest = PRESETS.index(SLOWEST_PRESET) if SLOWEST_PRESET in PRESETS else len(PRESETS) - 1
+    for preset in reversed(PRESETS[:slowest + 1]):
+        speed = speeds.get(preset)
+        if not speed:
+            continue
+        estimate = (duration or 0) * scale / (speed * cpu_share)
+        if estimate <= deadline:
+            return preset, crf
+
+    # Nothing fits: go as fast as possible and let CRF rise a notch to keep size in check
+    return PRESETS[0], crf + 2
+
+
+def calibrate(sample=None, seconds=10, path=CALIBRATION_FILE):
+    """
+    Measure every preset's realtime speed factor on this host
+
+    Encodes `seconds` of `sample` (or a synthetic 1080p test pattern) with
+    each preset and writes the results to `path`.
+    """
+    speeds = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        if sample:
+            source = ["-t", str(seconds), "-i", str(sample)]
+        else:
+            source = ["-f", "lavfi", "-i", f"testsrc2=size=1920x1080:rate=30:duration={seconds}"]
+        for preset in PRESETS:
+            output = Path(work_dir) / f"{preset}.mp4"
+            start = time.perf_counter()
+            subprocess.run(
+                ["ffmpeg", "-y", *source, "-an", "-c:v", "libx264",
+                 "-preset", preset, "-crf", "23", str(output)],
+                check=True,
+                capture_output=True
+            )
+            elapsed = time.perf_counter() - start
+            speeds[preset] = round(seconds / elapsed, 3)
+            print(f"   {preset:<10} {speeds[preset]:6.2f}x realtime  "
+                  f"{output.stat().st_size * 8 / seconds / 1000:8.0f} kbps")
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({'speeds': speeds, 'calibrated': time.time(), 'cpus': os.cpu_count()}, indent=2))
+    print(f"✅ Calibration saved to: {path}")
+    return speeds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate or query the encode policy')
+    parser.add_argument('--calibrate', action='store_true', help='Benchmark every preset on this host')
+    parser.add_argument('--sample', help='Video to benchmark with (default: synthetic 1080p pattern)')
+    parser.add_argument('--output', default=str(CALIBRATION_FILE), help='Calibration file to write')
+    parser.add_argument('--duration', type=float, help='Show the choice for a video of this many seconds')
+    parser.add_argument('--height', type=int, default=1080, help='Source height for --duration')
+    parser.add_argument('--queue-depth', type=int, default=0, help='Concurrent encodes for --duration')
+    parser.add_argument('--deadline', type=float, help='Deadline in seconds for --duration')
+    args = parser.parse_args()
+
+    if args.calibrate:
+        print("⏱️ Calibrating x264 presets...")
+        calibrate(args.sample, path=args.output)
+    if args.duration:
+        width = args.height * 16 // 9
+        preset, crf = choose_encoding(args.duration, width, args.height, args.queue_depth,
+                                      args.deadline, speeds=load_speeds(args.output))
+        print(f"preset={preset} crf={crf}")
+    if not args.calibrate and not args.duration:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
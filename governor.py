@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Upstream Governor
+Adaptive retry, per-host throttling and circuit breaking for extraction
+
+Every extraction from an upstream host goes through one shared Governor, which
+- classifies failures as throttled, retryable or fatal,
+- retries the first two with exponential backoff and full jitter,
+- caps concurrent calls and call rate per host, halving both on HTTP 429
+  and recovering them step by step after successes,
+- opens a circuit breaker after sustained failures so queued jobs fail
+  fast instead of piling onto a struggling host.
+
+The limits apply per process; each worker container governs itself.
+
+Self-test against a local stub server that injects 429s:
+    python governor.py --selftest
+"""
+
+import os
+import random
+import re
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+THROTTLED = 'throttled'
+RETRYABLE = 'retryable'
+FATAL = 'fatal'
+SUCCESS = 'success'
+
+MAX_CONCURRENCY = int(os.environ.get('GOVERNOR_MAX_CONCURRENCY', '4'))
+MAX_RATE = float(os.environ.get('GOVERNOR_MAX_RATE', '2'))           # calls per second
+MIN_RATE = float(os.environ.get('GOVERNOR_MIN_RATE', '0.05'))
+MAX_ATTEMPTS = int(os.environ.get('GOVERNOR_MAX_ATTEMPTS', '4'))
+BACKOFF_BASE = float(os.environ.get('GOVERNOR_BACKOFF_BASE', '2'))     # seconds
+BACKOFF_CAP = float(os.environ.get('GOVERNOR_BACKOFF_CAP', '60'))
+BREAKER_THRESHOLD = int(os.environ.get('GOVERNOR_BREAKER_THRESHOLD', '5'))
+BREAKER_COOLDOWN = float(os.environ.get('GOVERNOR_BREAKER_COOLDOWN', '120'))
+# Successes needed before a throttled host gets one more slot and a faster rate
+RECOVER_AFTER = 3
+# 429s arriving together come from one burst; only cut the limits once per window
+DECREASE_WINDOW = 1.0
+
+THROTTLE_MARKERS = ('http error 429', 'too many requests', 'rate-limit', 'rate limit', 'throttl')
+FATAL_MARKERS = (
+    'unsupported url', 'video unavailable', 'private video', 'not available',
+    'members-only', 'sign in to confirm', 'is not a valid url', 'copyright',
+    'http error 400', 'http error 401', 'http error 403', 'http error 404', 'http error 410',
+)
+RETRYABLE_MARKERS = (
+    'http error 5', 'timed out', 'timeout', 'connection reset', 'connection refused',
+    'connection aborted', 'temporary failure', 'incompleteread', 'remote end closed',
+    'unable to download',
+)
+
+
+class UpstreamError(Exception):
+    """
+    An upstream call failed for good
+
+    Attributes:
+        kind: THROTTLED, RETRYABLE or FATAL
+        retry_after: Seconds the caller should wait before trying again (or None)
+    """
+
+    def __init__(self, message, kind, retry_after=None):
+        super().__init__(message)
+        self.kind = kind
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        return self.kind != FATAL
+
+
+class CircuitOpenError(UpstreamError):
+    """The host has failed too often recently; calls are refused without trying"""
+
+    def __init__(self, host, retry_after):
+        super().__init__(f"Upstream {host} is failing, try again in {int(retry_after) + 1}s",
+                         THROTTLED, retry_after)
+
+
+def _error_chain(exc):
+    """The exception plus everything it wraps (yt-dlp keeps the cause in exc_info)"""
+    seen = []
+    while exc is not None and exc not in seen:
+        seen.append(exc)
+        exc_info = getattr(exc, 'exc_info', None)
+        wrapped = exc_info[1] if isinstance(exc_info, tuple) and len(exc_info) > 1 else None
+        exc = wrapped or exc.__cause__ or exc.__context__
+    return seen
+
+
+def _status_code(exc):
+    """HTTP status carried by urllib or yt-dlp HTTP errors"""
+    for attr in ('status', 'code'):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int) and 100 <= value < 600:
+            return value
+    return None
+
+
+def retry_after_seconds(exc):
+    """Retry-After header value (in seconds) from an HTTP error, if any"""
+    for err in _error_chain(exc):
+        headers = getattr(err, 'headers', None) or getattr(getattr(err, 'response', None), 'headers', None)
+        value = headers.get('Retry-After') if headers is not None else None
+        if value and str(value).strip().isdigit():
+            return float(value)
+    return None
+
+
+def classify_error(exc):
+    """Decide whether a failure is THROTTLED, RETRYABLE or FATAL"""
+    for err in _error_chain(exc):
+        status = _status_code(err)
+        if status == 429:
+            return THROTTLED
+        if status is not None and status >= 500:
+            return RETRYABLE
+        if status is not None and status >= 400:
+            return FATAL
+
+    message = " ".join(str(err) for err in _error_chain(exc)).lower()
+    if any(marker in message for marker in THROTTLE_MARKERS):
+        return THROTTLED
+    if any(marker in message for marker in FATAL_MARKERS):
+        return FATAL
+    if any(marker in message for marker in RETRYABLE_MARKERS):
+        return RETRYABLE
+    if any(isinstance(err, (ConnectionError, TimeoutError, socket.timeout)) for err in _error_chain(exc)):
+        return RETRYABLE
+    return FATAL
+
+
+def host_of(url):
+    """Host a URL is governed under (www./m. prefixes and youtu.be folded together)"""
+    host = (urlparse(url).hostname or url).lower()
+    host = re.sub(r'^(www|m|music)\.', '', host)
+    return 'youtube.com' if host == 'youtu.be' else host
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Exponential backoff with full jitter for the given (1-based) attempt"""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class HostLimiter:
+    """Concurrency cap, pacing and circuit breaker for one host"""
+
+    def __init__(self, host, max_concurrency=MAX_CONCURRENCY, max_rate=MAX_RATE, min_rate=MIN_RATE,
+                 breaker_threshold=BREAKER_THRESHOLD, breaker_cooldown=BREAKER_COOLDOWN):
+        self.host = host
+        self.max_concurrency = max_concurrency
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+
+        self.limit = max_concurrency
+        self.rate = max_rate
+        self.active = 0
+        self.next_start = 0.0
+        self.failures = 0
+        self.successes = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Wait for a slot and for the pacing interval; raises CircuitOpenError"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self.open_until > now:
+                    raise CircuitOpenError(self.host, self.open_until - now)
+                if self.failures >= self.breaker_threshold:
+                    # Breaker cooled down: let a single probe through (half-open)
+                    if self.probing:
+                        raise CircuitOpenError(self.host, 1)
+                    self.probing = True
+                    break
+                if self.active < int(self.limit):
+                    break
+                self._cond.wait()
+
+            self.active += 1
+            start = max(now, self.next_start)
+            self.next_start = start + 1 / self.rate
+        time.sleep(max(0.0, start - time.monotonic()))
+
+    def release(self, outcome):
+        """Return a slot and adapt the limits to how the call went"""
+        now = time.monotonic()
+        with self._cond:
+            self.active -= 1
+            self.probing = False
+            if outcome == SUCCESS:
+                self.failures = 0
+                self.successes += 1
+                if self.successes >= RECOVER_AFTER:
+                    self.successes = 0
+                    self.limit = min(self.max_concurrency, self.limit + 1)
+                    self.rate = min(self.max_rate, self.rate * 1.25)
+            elif outcome == RETRYABLE:
+                self.successes = 0
+                self.failures += 1
+            elif outcome == THROTTLED:
+                self.successes = 0
+                # A burst of 429s from one window counts as a single failure
+                if now - self.last_decrease >= DECREASE_WINDOW:
+                    self.last_decrease = now
+                    self.failures += 1
+                    self.limit = max(1, self.limit / 2)
+                    self.rate = max(self.min_rate, self.rate / 2)
+            if outcome in (THROTTLED, RETRYABLE) and self.failures >= self.breaker_threshold:
+                self.open_until = now + self.breaker_cooldown
+                print(f"🚫 Circuit open for {self.host} ({self.failures} failures in a row)")
+            self._cond.notify_all()
+
+    def snapshot(self):
+        """Current limits for status reporting"""
+        with self._cond:
+            return {
+                'active': self.active,
+                'concurrency_limit': int(self.limit),
+                'rate_per_second': round(self.rate, 3),
+                'consecutive_failures': self.failures,
+                'circuit_open': self.open_until > time.monotonic(),
+            }
+
+
+class Governor:
+    """Shared entry point that routes every upstream call through its host's limiter"""
+
+    def __init__(self, max_attempts=MAX_ATTEMPTS, **limiter_options):
+        self.max_attempts = max_attempts
+        self.limiter_options = limiter_options
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, url):
+        """HostLimiter for the host serving `url`"""
+        host = host_of(url)
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostLimiter(host, **self.limiter_options)
+            return self._hosts[host]
+
+    def call(self, url, func, *args, **kwargs):
+        """
+        Run `func(*args, **kwargs)` against the host of `url` under its limits
+
+        Raises:
+            CircuitOpenError: if the host's breaker is open
+            UpstreamError: once the failure is fatal or attempts are used up
+        """
+        limiter = self.limiter(url)
+        for attempt in range(1, self.max_attempts + 1):
+            limiter.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                kind = classify_error(e)
+                limiter.release(kind)
+                retry_after = retry_after_seconds(e)
+                if kind == FATAL or attempt == self.max_attempts:
+                    raise UpstreamError(str(e), kind, retry_after) from e
+                delay = max(backoff_delay(attempt), retry_after or 0)
+                print(f"⏳ {kind} error from {limiter.host} (attempt {attempt}/{self.max_attempts}), "
+                      f"retrying in {delay:.1f}s: {e}")
+                time.sleep(delay)
+                continue
+            limiter.release(SUCCESS)
+            return result
+
+    def snapshot(self):
+        """Limits of every host seen so far"""
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {host: limiter.snapshot() for host, limiter in hosts.items()}
+
+
+# One governor for every download in this process
+GOVERNOR = Governor()
+
+
+def governed_download(ydl, url, governor=GOVERNOR):
+    """
+    Extract `url` under the governor, then download it outside
+
+    Only the extraction takes the host's slot and is retried; the transfer
+    (which yt-dlp retries itself) would otherwise hold the slot for its
+    whole length and start over on every retry.
+
+    Returns:
+        The yt-dlp info dict after downloading
+    """
+    info = governor.call(url, ydl.extract_info, url, download=False)
+    return ydl.process_ie_result(info, download=True)
+
+
+def _selftest():
+    """Drive the governor against a stub server that throttles bursts"""
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    stats = {'ok': 0, 'throttled': 0}
+    window = []
+    lock = threading.Lock()
+
+    class ThrottlingHandler(BaseHTTPRequestHandler):
+        """Answers 429 whenever more than 5 requests arrived in the last second"""
+
+        def do_GET(self):
+            now = time.monotonic()
+            with lock:
+                window[:] = [t for t in window if now - t < 1] + [now]
+                throttled = len(window) > 5
+                stats['throttled' if throttled else 'ok'] += 1
+            self.send_response(429 if throttled else 200)
+            if throttled:
+                self.send_header('Retry-After', '1')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ThrottlingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/video"
+    governor = Governor(max_attempts=6, max_concurrency=8, max_rate=50)
+
+    def fetch(_):
+        try:
+            return governor.call(url, lambda: urllib.request.urlopen(url, timeout=5).status)
+        except UpstreamError as e:
+            return e.kind
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(fetch, range(40)))
+    server.shutdown()
+
+    succeeded = results.count(200)
+    print(f"Calls: {len(results)}, succeeded: {succeeded}, gave up: {len(results) - succeeded}")
+    print(f"Stub saw {stats['ok']} OK and {stats['throttled']} throttled requests "
+          f"in {time.monotonic() - started:.1f}s")
+    print(f"Limits after run: {governor.snapshot()}")
+    return succeeded == len(results)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if '--selftest' not in sys.argv:
+        print(__doc__)
+        sys.exit(0)
+    sys.exit(0 if _selftest() else 1)
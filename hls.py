@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+HLS Output
+Encodes a video (or part of it) into an HLS playlist plus segments
+
+The playlist is written as an EVENT playlist that grows with every finished
+segment, so a player can start as soon as the first segment exists while the
+rest is still being encoded.
+"""
+
+import os
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from accounting import exited, reap
+
+HLS_PLAYLIST = 'index.m3u8'
+HLS_SEGMENT_SECONDS = int(os.environ.get('HLS_SEGMENT_SECONDS', '4'))
+POLL_INTERVAL = 0.5
+
+CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+}
+
+
+def count_segments(playlist):
+    """Segments listed in a (possibly still growing) playlist"""
+    try:
+        text = Path(playlist).read_text()
+    except OSError:
+        return 0
+    return sum(1 for line in text.splitlines() if line and not line.startswith('#'))
+
+
+def encode_hls(input_file, output_dir, start_time=None, end_time=None, preset='veryfast', crf=23,
+               on_segment=None):
+    """
+    Encode `input_file` to h264/aac HLS in `output_dir`
+
+    Args:
+        input_file: Source video
+        output_dir: Directory receiving the playlist and segments
+        start_time: Start time in seconds (None = from beginning)
+        end_time: End time in seconds (None = to end)
+        preset, crf: x264 settings
+        on_segment: Called with the segment count each time a segment is added
+
+    Returns:
+        True if successful, False otherwise
+    """
+    output_dir = Path(output_dir)
+    playlist = output_dir / HLS_PLAYLIST
+
+    cmd = ["ffmpeg", "-y", "-loglevel", "error"]
+    if start_time is not None:
+        cmd.extend(["-ss", str(start_time)])
+    cmd.extend(["-i", str(input_file)])
+    if end_time is not None:
+        cmd.extend(["-t", str(end_time - (start_time or 0))])
+    cmd.extend([
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-c:v", "libx264", "-preset", preset, "-crf", str(crf), "-pix_fmt", "yuv420p",
+        # A keyframe at every segment boundary keeps segments the same length
+        "-force_key_frames", f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})",
+        "-c:a", "aac", "-b:a", "128k", "-ac", "2",
+        "-f", "hls", "-hls_time", str(HLS_SEGMENT_SECONDS),
+        "-hls_playlist_type", "event",
+        "-hls_flags", "independent_segments+temp_file",
+        "-hls_segment_filename", str(output_dir / "seg%05d.ts"),
+        str(playlist)
+    ])
+
+    print(f"Running: {' '.join(cmd)}")
+    # stderr goes to a file: nobody reads a pipe while we poll, so a noisy
+    # encode could fill it and block ffmpeg
+    with tempfile.TemporaryFile() as stderr:
+        started = time.monotonic()
+        process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=stderr)
+        reported = 0
+        while True:
+            # Checked without reaping, so reap() can meter the encoder
+            finished = exited(process)
+            segments = count_segments(playlist)
+            if on_segment and segments > reported:
+                reported = segments
+                on_segment(segments)
+            if finished:
+                break
+            time.sleep(POLL_INTERVAL)
+        reap(process, started=started)
+
+        if process.returncode != 0:
+            stderr.seek(0)
+            print(f"ffmpeg failed with exit code {process.returncode}")
+            print(f"stderr: {stderr.read().decode(errors='replace')}")
+            return False
+    print(f"HLS output saved to: {playlist} ({reported} segments)")
+    return True
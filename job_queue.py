@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Shared Job Queue
+SQLite-backed job queue that several worker containers can pull from
+
+Workers claim a job with a time-limited lease and keep it alive with
+heartbeats. If a worker dies, its lease runs out and the job goes back to
+the queue for another worker, up to JOB_MAX_ATTEMPTS tries.
+
+Waiting jobs are claimed shortest-first by their preflight cost estimate,
+with aging and lane weights as described in scheduler.py. Jobs still in
+preflight are held back for up to PREFLIGHT_TIMEOUT seconds.
+
+The database must live on a filesystem with working file locks (a local
+disk or a Docker volume shared by containers on one host; not NFS).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+
+from jobs import Job, QUEUED, RUNNING, DONE, FAILED
+from scheduler import INTERACTIVE, BATCH, AGING, BATCH_WEIGHT, DEFAULT_COST
+
+JOB_LEASE = int(os.environ.get('JOB_LEASE_SECONDS', '60'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+PREFLIGHT_TIMEOUT = float(os.environ.get('SCHEDULER_PREFLIGHT_TIMEOUT', '60'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    lane TEXT NOT NULL DEFAULT 'interactive',
+    cost REAL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress REAL,
+    entry_id TEXT,
+    filename TEXT,
+    error TEXT,
+    resources TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+"""
+
+# Columns added after the first release, created on existing databases
+MIGRATIONS = {
+    'lane': "TEXT NOT NULL DEFAULT 'interactive'",
+    'cost': "REAL",
+    'resources': "TEXT",
+}
+
+# Columns that map straight onto Job attributes
+JOB_FIELDS = ('status', 'stage', 'progress', 'entry_id', 'filename', 'error', 'cost', 'resources')
+# Of those, the ones stored as JSON text
+JSON_FIELDS = ('resources',)
+
+
+class SqliteJobQueue:
+    """
+    Job queue in one SQLite file
+
+    Offers the same submit/get/update interface as jobs.JobStore, so the web
+    app can use either, plus claim/heartbeat/complete/fail for workers.
+
+    Args:
+        db_path: SQLite database file (created if missing)
+        lease: Seconds a claimed job stays owned without a heartbeat
+        max_attempts: Claims per job before it is marked failed
+    """
+
+    def __init__(self, db_path, lease=JOB_LEASE, max_attempts=JOB_MAX_ATTEMPTS):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease = lease
+        self.max_attempts = max_attempts
+        with closing(self._connect()) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            columns = {row[1] for row in db.execute("PRAGMA table_info(jobs)")}
+            for name, declaration in MIGRATIONS.items():
+                if name not in columns:
+                    db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {declaration}")
+
+    def _connect(self):
+        """
+        New autocommit connection (sqlite3 connections are not shared across threads)
+
+        Use it with contextlib.closing: a connection's own context manager
+        only ends a transaction and never closes it.
+        """
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _to_job(self, row):
+        """Build a Job from a database row"""
+        job = Job(row['kind'], json.loads(row['params']), job_id=row['id'], lane=row['lane'])
+        for name in JOB_FIELDS + ('created', 'updated'):
+            value = row[name]
+            if name in JSON_FIELDS and value is not None:
+                value = json.loads(value)
+            setattr(job, name, value)
+        return job
+
+    def submit(self, kind, params, runner=None, lane=INTERACTIVE, estimate=None):
+        """
+        Queue a job for any worker
+
+        `runner` is accepted for compatibility with JobStore and ignored;
+        workers pick the pipeline from the job kind. `estimate(params)` runs
+        in a background thread and stores the job's expected run time in
+        seconds, which decides its place in the queue.
+        """
+        job = Job(kind, params, lane=lane)
+        job.stage = 'preflight' if estimate else 'queued'
+        with closing(self._connect()) as db:
+            db.execute(
+                "INSERT INTO jobs (id, kind, params, lane, status, stage, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, kind, json.dumps(params), lane, QUEUED, job.stage, job.created, job.created)
+            )
+        if estimate:
+            threading.Thread(target=self._preflight, args=(job, estimate), daemon=True).start()
+        return job
+
+    def _preflight(self, job, estimate):
+        """Store a job's cost estimate and release it to the workers"""
+        cost = estimate(job.params)
+        with closing(self._connect()) as db:
+            db.execute(
+                "UPDATE jobs SET cost = ?, stage = 'queued', updated = ? "
+                "WHERE id = ? AND status = ? AND stage = 'preflight'",
+                (cost, time.time(), job.id, QUEUED)
+            )
+
+    def get(self, job_id):
+        """Job by id, or None if unknown"""
+        with closing(self._connect()) as db:
+            db.row_factory = sqlite3.Row
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def update(self, job_id, **fields):
+        """Set job fields and bump its update time"""
+        fields = {
+            k: json.dumps(v) if k in JSON_FIELDS and v is not None else v
+            for k, v in fields.items() if k in JOB_FIELDS
+        }
+        if not fields:
+            return
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with closing(self._connect()) as db:
+            db.execute(
+                f"UPDATE jobs SET {assignments}, updated = ? WHERE id = ?",
+                (*fields.values(), time.time(), job_id)
+            )
+
+    def claim(self, worker_id, lanes=None):
+        """
+        Take the best runnable job for `worker_id`
+
+        Runnable means queued (and past preflight), or running with an
+        expired lease (its worker died). The cheapest job after aging and
+        lane weights goes first. Jobs that ran out of attempts are marked
+        failed instead.
+
+        Args:
+            worker_id: Lease owner
+            lanes: Only take jobs from these lanes (default: any)
+
+        Returns:
+            The claimed Job, or None if there is nothing to do
+        """
+        now = time.time()
+        db = self._connect()
+        db.row_factory = sqlite3.Row
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute(
+                "UPDATE jobs SET status = ?, stage = 'failed', error = ?, lease_owner = NULL, updated = ? "
+                "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, 'Worker lost too many times', now, RUNNING, now, self.max_attempts)
+            )
+            lanes = list(lanes or [])
+            lane_filter = f"AND lane IN ({', '.join('?' * len(lanes))}) " if lanes else ""
+            # Same ordering as scheduler.priority_key
+            row = db.execute(
+                "SELECT * FROM jobs WHERE ((status = ? AND (stage != 'preflight' OR created < ?)) "
+                "OR (status = ? AND lease_expires < ?)) " + lane_filter +
+                "ORDER BY COALESCE(cost, ?) * CASE lane WHEN ? THEN ? ELSE 1 END + ? * created LIMIT 1",
+                (QUEUED, now - PREFLIGHT_TIMEOUT, RUNNING, now, *lanes,
+                 DEFAULT_COST, BATCH, BATCH_WEIGHT, AGING)
+            ).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            db.execute(
+                "UPDATE jobs SET status = ?, stage = 'starting', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated = ? WHERE id = ?",
+                (RUNNING, worker_id, now + self.lease, now, row['id'])
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+
+        job = self._to_job(row)
+        job.status = RUNNING
+        job.attempts = row['attempts'] + 1
+        return job
+
+    def heartbeat(self, job_id, worker_id):
+        """
+        Extend the lease on a job
+
+        Returns:
+            False if the job is no longer ours (lease expired and re-claimed)
+        """
+        now = time.time()
+        with closing(self._connect()) as db:
+            cursor = db.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = ?",
+                (now + self.lease, now, job_id, worker_id, RUNNING)
+            )
+            return cursor.rowcount == 1
+
+    def withdraw(self, job_id, error):
+        """
+        Fail a job that no worker has claimed yet
+
+        Returns:
+            False if a worker took it in the meantime
+        """
+        with closing(self._connect()) as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = ?, stage = 'failed', error = ?, updated = ? WHERE id = ? AND status = ?",
+                (FAILED, error, time.time(), job_id, QUEUED)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, entry_id, filename):
+        """Record a finished job's output"""
+        with closing(self._connect()) as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, stage = 'done', progress = 100, entry_id = ?, filename = ?, "
+                "lease_owner = NULL, updated = ? WHERE id = ? AND lease_owner = ?",
+                (DONE, entry_id, filename, time.time(), job_id, worker_id)
+            )
+
+    def fail(self, job_id, worker_id, error, retry=False):
+        """Record a failed job, or put it back in the queue if `retry` and attempts remain"""
+        with closing(self._connect()) as db:
+            db.execute(
+                "UPDATE jobs SET status = CASE WHEN ? AND attempts < ? THEN ? ELSE ? END, "
+                "stage = CASE WHEN ? AND attempts < ? THEN 'queued' ELSE 'failed' END, "
+                "error = ?, lease_owner = NULL, updated = ? WHERE id = ? AND lease_owner = ?",
+                (retry, self.max_attempts, QUEUED, FAILED,
+                 retry, self.max_attempts, error, time.time(), job_id, worker_id)
+            )
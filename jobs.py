@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Job Tracking
+Runs pipeline work in the background and keeps its status for polling
+
+Clients submit a job, poll its status (stage and progress) and fetch the
+result through a plain link once it is done, so nothing has to be held open
+or buffered while the pipeline runs.
+"""
+
+import os
+import threading
+import time
+import traceback
+import uuid
+
+from accounting import ResourceMeter, metering, log_usage
+from scheduler import INTERACTIVE, PriorityGate
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+# Finished jobs are forgotten after this many seconds
+JOB_RETENTION = int(os.environ.get('OUTPUT_TTL_HOURS', '24')) * 3600
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'error'
+
+
+class Job:
+    """State of one submitted pipeline run"""
+
+    def __init__(self, kind, params, job_id=None, lane=INTERACTIVE):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.lane = lane
+        self.cost = None
+        self.status = QUEUED
+        self.stage = 'queued'
+        self.progress = None
+        self.entry_id = None
+        self.filename = None
+        self.error = None
+        # Per-stage child-process usage (see accounting.ResourceMeter.to_dict)
+        self.resources = None
+        self.created = time.time()
+        self.updated = self.created
+
+    def to_dict(self):
+        """JSON-friendly view of the job"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'lane': self.lane,
+            'cost': self.cost,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'entry_id': self.entry_id,
+            'filename': self.filename,
+            'error': self.error,
+            'resources': self.resources,
+            'created': self.created,
+            'updated': self.updated,
+        }
+
+
+class JobStore:
+    """
+    In-process job registry
+
+    Every job gets its own thread, which waits on a scheduler.PriorityGate
+    for its turn, so the cheapest waiting job starts whenever a slot frees.
+
+    Args:
+        workers: Number of jobs that run at the same time
+        gate: Gate to share with other pipeline runs (default: a new one with `workers` slots)
+    """
+
+    def __init__(self, workers=JOB_WORKERS, gate=None):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.gate = gate or PriorityGate(workers)
+
+    def submit(self, kind, params, runner, lane=INTERACTIVE, estimate=None):
+        """
+        Queue `runner(params, report)` as a new job
+
+        `runner` returns (entry_id, output_path) and reports progress through
+        `report(stage, progress=None, **fields)`; extra fields (entry_id,
+        filename) let clients use an output that is still being written.
+        `estimate(params)` returns the job's expected run time in seconds
+        (or None) for shortest-job-first ordering; it is skipped when a slot
+        is free anyway.
+
+        Returns:
+            The new Job
+        """
+        job = Job(kind, params, lane=lane)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        threading.Thread(target=self._run, args=(job, runner, estimate),
+                         name=f'job-{job.id[:8]}', daemon=True).start()
+        return job
+
+    def get(self, job_id):
+        """Job by id, or None if unknown or forgotten"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def update(self, job_id, **fields):
+        """Set job fields and bump its update time"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.updated = time.time()
+
+    def _run(self, job, runner, estimate):
+        """Wait for the job's turn, execute it and record its outcome"""
+        meter = ResourceMeter(job.id, job.kind)
+
+        def report(stage, progress=None, **fields):
+            meter.enter(stage)
+            self.update(job.id, stage=stage, progress=progress, resources=meter.to_dict(), **fields)
+
+        if estimate and self.gate.busy():
+            self.update(job.id, stage='preflight')
+            self.update(job.id, stage='queued', cost=estimate(job.params))
+
+        with self.gate.slot(job.cost, job.lane, job.created), metering(meter):
+            self.update(job.id, status=RUNNING, stage='starting')
+            try:
+                entry_id, output_file = runner(job.params, report)
+                self.update(job.id, status=DONE, stage='done', progress=100, resources=meter.to_dict(),
+                            entry_id=entry_id, filename=output_file.name)
+            except Exception as e:
+                print(f"Job {job.id} failed: {e}")
+                traceback.print_exc()
+                self.update(job.id, status=FAILED, stage='failed', error=str(e), resources=meter.to_dict())
+        log_usage(meter, job.status, {'params': job.params})
+
+    def _prune(self):
+        """Forget finished jobs past their retention (caller holds the lock)"""
+        cutoff = time.time() - JOB_RETENTION
+        for job_id in [j.id for j in self._jobs.values()
+                       if j.status in (DONE, FAILED) and j.updated < cutoff]:
+            del self._jobs[job_id]
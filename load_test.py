@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Load Test
+Drives /api/download at rising concurrency and reports capacity
+
+Each request picks a random quality, an optional trim and a Plex flag from
+the configured mix. A unique query string is added to every source URL so
+the output store cannot answer from a previous run (use --allow-cache to
+measure cache hits instead). Pair with mock_origin.py for offline,
+repeatable runs.
+
+Usage: python load_test.py --url http://HOST:8800/watch/sample [--concurrency 1,2,4,8] [--requests 20]
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+READ_SIZE = 256 * 1024
+
+
+def percentile(values, share):
+    """Nearest-rank percentile of `values` (share in 0-1)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(share * len(ordered)) - 1))]
+
+
+class RequestMix:
+    """
+    Random /api/download parameters drawn from a configured mix
+
+    Args:
+        urls: Source URLs to choose from
+        qualities: Qualities to choose from
+        trim_share: Share of requests that ask for a trim
+        trim_length: Seconds kept by a trim
+        max_start: Latest trim start in seconds
+        plex_share: Share of requests with plex_compatible=1
+        allow_cache: Keep source URLs as given, so repeats can hit the output store
+        seed: Random seed for a repeatable sequence of requests
+    """
+
+    def __init__(self, urls, qualities, trim_share=0.5, trim_length=10, max_start=30,
+                 plex_share=0.5, allow_cache=False, seed=None):
+        self.urls = urls
+        self.qualities = qualities
+        self.trim_share = trim_share
+        self.trim_length = trim_length
+        self.max_start = max_start
+        self.plex_share = plex_share
+        self.allow_cache = allow_cache
+        self.random = random.Random(seed)
+
+    def next(self):
+        """Parameters for one request"""
+        url = self.random.choice(self.urls)
+        if not self.allow_cache:
+            url += ('&' if '?' in url else '?') + f"lt={uuid.UUID(int=self.random.getrandbits(128)).hex}"
+        params = {
+            'url': url,
+            'quality': self.random.choice(self.qualities),
+            'plex_compatible': '1' if self.random.random() < self.plex_share else '0',
+        }
+        if self.random.random() < self.trim_share:
+            start = self.random.randint(0, self.max_start)
+            params['start_time'] = str(start)
+            params['end_time'] = str(start + self.trim_length)
+        return params
+
+
+def run_request(server, params, timeout):
+    """
+    Issue one download and read the whole response
+
+    Returns:
+        Result dict with status, latency, time to first byte and bytes received
+    """
+    started = time.perf_counter()
+    result = {'quality': params['quality'], 'trim': 'start_time' in params,
+              'plex': params['plex_compatible'] == '1', 'bytes': 0, 'ttfb': None}
+    try:
+        with urlopen(f"{server}/api/download?{urlencode(params)}", timeout=timeout) as response:
+            result['ttfb'] = time.perf_counter() - started
+            while True:
+                chunk = response.read(READ_SIZE)
+                if not chunk:
+                    break
+                result['bytes'] += len(chunk)
+            result['status'] = response.status
+    except HTTPError as e:
+        result['status'] = e.code
+        e.close()
+    except (URLError, OSError) as e:
+        result['status'] = type(getattr(e, 'reason', e)).__name__
+    result['latency'] = time.perf_counter() - started
+    return result
+
+
+def run_level(server, mix, concurrency, requests, timeout):
+    """Run `requests` downloads with `concurrency` in flight and summarize them"""
+    batch = [mix.next() for _ in range(requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda p: run_request(server, p, timeout), batch))
+    elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if r['status'] == 200]
+    latencies = [r['latency'] for r in ok]
+    return {
+        'concurrency': concurrency,
+        'requests': len(results),
+        'ok': len(ok),
+        'error_rate': round(1 - len(ok) / len(results), 4) if results else 0,
+        'statuses': dict(Counter(str(r['status']) for r in results)),
+        'elapsed': round(elapsed, 2),
+        'throughput_rps': round(len(ok) / elapsed, 3),
+        'throughput_mbps': round(sum(r['bytes'] for r in ok) * 8 / elapsed / 1e6, 2),
+        'latency_p50': percentile(latencies, 0.50),
+        'latency_p90': percentile(latencies, 0.90),
+        'latency_p99': percentile(latencies, 0.99),
+        'latency_max': max(latencies) if latencies else None,
+        'ttfb_p50': percentile([r['ttfb'] for r in ok], 0.50),
+        'results': results,
+    }
+
+
+def format_seconds(value):
+    """Seconds for the report table, or a dash when there is no value"""
+    return f"{value:7.2f}s" if value is not None else "      -"
+
+
+def print_level(level):
+    """Print one row of the report table"""
+    print(f"   {level['concurrency']:>4}  {level['ok']:>4}/{level['requests']:<4} "
+          f"{level['error_rate'] * 100:5.1f}%  {level['throughput_rps']:7.3f}  {level['throughput_mbps']:7.2f}  "
+          f"{format_seconds(level['latency_p50'])} {format_seconds(level['latency_p90'])} "
+          f"{format_seconds(level['latency_p99'])} {format_seconds(level['latency_max'])}")
+    errors = {status: count for status, count in level['statuses'].items() if status != '200'}
+    if errors:
+        print(f"         errors: {', '.join(f'{s}×{c}' for s, c in sorted(errors.items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test /api/download at rising concurrency')
+    parser.add_argument('--server', default='http://localhost:5000', help='Web app base URL (default: http://localhost:5000)')
+    parser.add_argument('--url', action='append', required=True,
+                        help='Source URL to download (repeat for a mix; e.g. mock origin /watch, HLS or DASH URLs)')
+    parser.add_argument('--concurrency', default='1,2,4,8', help='Comma-separated concurrency levels (default: 1,2,4,8)')
+    parser.add_argument('--requests', '-n', type=int, default=20, help='Requests per level (default: 20)')
+    parser.add_argument('--qualities', default='360p,720p,1080p', help='Comma-separated qualities to mix')
+    parser.add_argument('--trim-share', type=float, default=0.5, help='Share of trimmed requests (default: 0.5)')
+    parser.add_argument('--trim-length', type=int, default=10, help='Seconds kept by a trim (default: 10)')
+    parser.add_argument('--max-start', type=int, default=30, help='Latest trim start in seconds (default: 30)')
+    parser.add_argument('--plex-share', type=float, default=0.5, help='Share of plex_compatible=1 requests (default: 0.5)')
+    parser.add_argument('--allow-cache', action='store_true', help='Do not make URLs unique; measure retained outputs')
+    parser.add_argument('--timeout', type=float, default=600, help='Per-request timeout in seconds (default: 600)')
+    parser.add_argument('--seed', type=int, help='Random seed for a repeatable request mix')
+    parser.add_argument('--json', help='Also write the full report (with per-request results) here')
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+    mix = RequestMix(args.url, [q.strip() for q in args.qualities.split(',')], args.trim_share,
+                     args.trim_length, args.max_start, args.plex_share, args.allow_cache, args.seed)
+
+    print(f"🏋️ Load test against {args.server} ({args.requests} requests per level)")
+    print("   conc    ok/req    err      rps     Mbps      p50      p90      p99      max")
+    report = []
+    for concurrency in levels:
+        level = run_level(args.server, mix, concurrency, args.requests, args.timeout)
+        print_level(level)
+        report.append(level)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'server': args.server, 'urls': args.url, 'levels': report}, f, indent=2)
+        print(f"\n📄 Full report: {args.json}")
+
+    if any(level['ok'] == 0 for level in report):
+        print("\n❌ At least one level had no successful requests")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Mock Origin
+Local stand-in for a video site, for offline capacity tests
+
+Serves fixture media three ways, all understood by yt-dlp's generic extractor:
+    /watch/<name>                 HTML page with progressive MP4 <source>s per height
+    /media/<name>/<height>.mp4    progressive (faststart) MP4, with Range support
+    /hls/<name>/master.m3u8       HLS renditions
+    /dash/<name>/manifest.mpd     DASH video renditions plus one audio track
+
+Every response can be slowed (latency, per-connection bandwidth) or failed
+(error rate and status) to exercise retries and throttling. Query strings
+are ignored, so load tests can add one to make each URL unique.
+
+Usage: python mock_origin.py [--port 8800] [--source video.mp4] [--latency 0.2] [--error-rate 0.05]
+"""
+
+import argparse
+import json
+import mimetypes
+import os
+import random
+import re
+import subprocess
+import threading
+import time
+from html import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlsplit, unquote
+
+FIXTURES_PATH = Path(os.environ.get('MOCK_FIXTURES_PATH', Path(__file__).parent.absolute() / '.fixtures'))
+HEIGHTS = (360, 720, 1080)
+SEGMENT_SECONDS = 4
+CHUNK_SIZE = 64 * 1024
+
+CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.mpd': 'application/dash+xml',
+    '.ts': 'video/mp2t',
+    '.m4s': 'video/iso.segment',
+    '.mp4': 'video/mp4',
+    '.html': 'text/html; charset=utf-8',
+}
+
+
+def run_ffmpeg(cmd):
+    """Run an ffmpeg/ffprobe command, raising with its stderr on failure"""
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{cmd[0]} failed: {result.stderr[-500:]}")
+    return result.stdout
+
+
+def prepare_fixture(name, source=None, duration=60, heights=HEIGHTS, root=FIXTURES_PATH):
+    """
+    Build the progressive, HLS and DASH variants of one fixture
+
+    Args:
+        name: Fixture name used in URLs
+        source: Video to transcode (None = synthetic test pattern with a tone)
+        duration: Seconds of synthetic video (or of `source` to keep)
+        heights: Renditions to produce
+        root: Fixtures directory
+
+    Returns:
+        The fixture directory (reused as-is if already built)
+    """
+    fixture_dir = Path(root) / name
+    manifest = fixture_dir / 'fixture.json'
+    if manifest.exists():
+        return fixture_dir
+
+    print(f"🎞️ Building fixture '{name}' ({duration}s, {', '.join(f'{h}p' for h in heights)})...")
+    media_dir = fixture_dir / 'media'
+    hls_dir = fixture_dir / 'hls'
+    dash_dir = fixture_dir / 'dash'
+    for directory in (media_dir, hls_dir, dash_dir):
+        directory.mkdir(parents=True, exist_ok=True)
+
+    if source:
+        inputs = ["-t", str(duration), "-i", str(source)]
+    else:
+        inputs = [
+            "-f", "lavfi", "-i", f"testsrc2=size=1920x1080:rate=30:duration={duration}",
+            "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={duration}",
+        ]
+
+    renditions = []
+    for height in heights:
+        output = media_dir / f"{height}.mp4"
+        # Fixed GOP so HLS/DASH segment boundaries line up across renditions
+        run_ffmpeg([
+            "ffmpeg", "-y", *inputs, "-vf", f"scale=-2:{height}",
+            "-c:v", "libx264", "-preset", "veryfast", "-profile:v", "high",
+            "-g", str(30 * SEGMENT_SECONDS), "-keyint_min", str(30 * SEGMENT_SECONDS), "-sc_threshold", "0",
+            "-c:a", "aac", "-b:a", "128k", "-movflags", "+faststart", str(output)
+        ])
+        bandwidth = int(output.stat().st_size * 8 / duration)
+        renditions.append({'height': height, 'width': height * 16 // 9, 'bandwidth': bandwidth})
+
+        rendition_dir = hls_dir / str(height)
+        rendition_dir.mkdir(exist_ok=True)
+        run_ffmpeg([
+            "ffmpeg", "-y", "-i", str(output), "-c", "copy", "-f", "hls",
+            "-hls_time", str(SEGMENT_SECONDS), "-hls_playlist_type", "vod",
+            "-hls_segment_filename", str(rendition_dir / "seg%05d.ts"),
+            str(rendition_dir / "index.m3u8")
+        ])
+
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    for rendition in renditions:
+        lines.append(
+            f"#EXT-X-STREAM-INF:BANDWIDTH={rendition['bandwidth']},"
+            f"RESOLUTION={rendition['width']}x{rendition['height']},"
+            f'CODECS="avc1.640028,mp4a.40.2"'
+        )
+        lines.append(f"{rendition['height']}/index.m3u8")
+    (hls_dir / 'master.m3u8').write_text("\n".join(lines) + "\n")
+
+    # One video adaptation set with every height, audio taken from the first rendition
+    dash_inputs, dash_maps = [], []
+    for index, height in enumerate(heights):
+        dash_inputs += ["-i", str(media_dir / f"{height}.mp4")]
+        dash_maps += ["-map", f"{index}:v"]
+    run_ffmpeg([
+        "ffmpeg", "-y", *dash_inputs, *dash_maps, "-map", "0:a", "-c", "copy", "-f", "dash",
+        "-seg_duration", str(SEGMENT_SECONDS), "-use_template", "1", "-use_timeline", "1",
+        "-adaptation_sets", "id=0,streams=v id=1,streams=a",
+        str(dash_dir / 'manifest.mpd')
+    ])
+
+    manifest.write_text(json.dumps({'name': name, 'duration': duration, 'renditions': renditions}, indent=2))
+    print(f"✅ Fixture ready: {fixture_dir}")
+    return fixture_dir
+
+
+class Faults:
+    """
+    Latency, bandwidth and error injection shared by all connections
+
+    Args:
+        latency: Seconds before each response starts
+        jitter: Extra random delay of up to this many seconds
+        bandwidth: Bytes per second per connection (0 = unlimited)
+        error_rate: Share of requests answered with `error_status`
+        error_status: HTTP status of injected errors (429/503 include Retry-After)
+        retry_after: Retry-After seconds sent with injected 429/503 responses
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, bandwidth=0, error_rate=0.0, error_status=503, retry_after=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.stats = {'requests': 0, 'errors': 0, 'bytes': 0}
+        self._lock = threading.Lock()
+
+    def count(self, **amounts):
+        """Add to the request/error/byte counters"""
+        with self._lock:
+            for name, amount in amounts.items():
+                self.stats[name] += amount
+
+    def delay(self):
+        """Sleep for the configured latency"""
+        wait = self.latency + random.uniform(0, self.jitter)
+        if wait > 0:
+            time.sleep(wait)
+
+    def should_fail(self):
+        """Whether this request gets an injected error"""
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+class OriginHandler(BaseHTTPRequestHandler):
+    """Routes requests to fixture files, applying the server's Faults"""
+
+    server_version = 'MockOrigin/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_HEAD(self):
+        self.handle_request(send_body=False)
+
+    def do_GET(self):
+        self.handle_request(send_body=True)
+
+    def handle_request(self, send_body):
+        faults = self.server.faults
+        faults.count(requests=1)
+        faults.delay()
+        if faults.should_fail():
+            faults.count(errors=1)
+            headers = {}
+            if faults.error_status in (429, 503):
+                headers['Retry-After'] = str(faults.retry_after)
+            self.send_text(faults.error_status, 'Injected failure\n', headers)
+            return
+
+        path = unquote(urlsplit(self.path).path)
+        if path == '/':
+            self.send_index()
+            return
+        if path == '/stats':
+            self.send_text(200, json.dumps(faults.stats) + "\n", {'Content-Type': 'application/json'})
+            return
+        match = re.fullmatch(r'/watch/([\w-]+)', path)
+        if match:
+            self.send_watch_page(match.group(1))
+            return
+        match = re.fullmatch(r'/(media|hls|dash)/([\w-]+)/([\w./-]+)', path)
+        if match and '..' not in match.group(3):
+            kind, name, rest = match.groups()
+            self.send_media(self.server.root / name / kind / rest, send_body)
+            return
+        self.send_text(404, 'Not found\n')
+
+    def send_text(self, status, text, headers=None):
+        body = text.encode()
+        self.send_response(status)
+        headers = dict({'Content-Type': 'text/plain; charset=utf-8'}, **(headers or {}))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def fixture_info(self, name):
+        try:
+            return json.loads((self.server.root / name / 'fixture.json').read_text())
+        except (OSError, ValueError):
+            return None
+
+    def send_index(self):
+        names = sorted(p.parent.name for p in self.server.root.glob('*/fixture.json'))
+        links = "".join(
+            f'<li><a href="/watch/{n}">{n}</a> · <a href="/hls/{n}/master.m3u8">HLS</a> · '
+            f'<a href="/dash/{n}/manifest.mpd">DASH</a></li>' for n in names
+        )
+        self.send_text(200, f"<!DOCTYPE html><html><body><ul>{links}</ul></body></html>",
+                       {'Content-Type': CONTENT_TYPES['.html']})
+
+    def send_watch_page(self, name):
+        info = self.fixture_info(name)
+        if info is None:
+            self.send_text(404, 'Unknown fixture\n')
+            return
+        # res/label are what the generic extractor reads for height and format id
+        sources = "".join(
+            f'<source src="/media/{name}/{r["height"]}.mp4" '
+            f'type=\'video/mp4; codecs="avc1.640028, mp4a.40.2"\' '
+            f'res="{r["height"]}" label="{r["height"]}p">'
+            for r in sorted(info['renditions'], key=lambda r: -r['height'])
+        )
+        page = (
+            f"<!DOCTYPE html><html><head><title>{escape(name)}</title></head>"
+            f"<body><video controls>{sources}</video></body></html>"
+        )
+        self.send_text(200, page, {'Content-Type': CONTENT_TYPES['.html']})
+
+    def send_media(self, file, send_body):
+        try:
+            size = file.stat().st_size
+        except OSError:
+            self.send_text(404, 'Not found\n')
+            return
+
+        start, end, status = 0, size - 1, 200
+        range_header = self.headers.get('Range')
+        match = re.fullmatch(r'bytes=(\d*)-(\d*)', range_header or '')
+        if match and match.group(1):
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            status = 206
+        elif match and match.group(2):
+            start, status = max(0, size - int(match.group(2))), 206
+        if status == 206 and (start >= size or end < start):
+            self.send_text(416, 'Range not satisfiable\n', {'Content-Range': f'bytes */{size}'})
+            return
+
+        content_type = CONTENT_TYPES.get(file.suffix) or mimetypes.guess_type(file.name)[0]
+        self.send_response(status)
+        self.send_header('Content-Type', content_type or 'application/octet-stream')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+        if send_body:
+            self.copy_throttled(file, start, end - start + 1)
+
+    def copy_throttled(self, file, offset, length):
+        """Write part of `file` at no more than the configured bandwidth"""
+        bandwidth = self.server.faults.bandwidth
+        started = time.monotonic()
+        sent = 0
+        with open(file, 'rb') as f:
+            f.seek(offset)
+            while sent < length:
+                chunk = f.read(min(CHUNK_SIZE, length - sent))
+                if not chunk:
+                    break
+                try:
+                    self.wfile.write(chunk)
+                except (BrokenPipeError, ConnectionResetError):
+                    break
+                sent += len(chunk)
+                if bandwidth:
+                    ahead = sent / bandwidth - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        self.server.faults.count(bytes=sent)
+
+
+class OriginServer(ThreadingHTTPServer):
+    """HTTP server holding the fixture root and fault settings for its handlers"""
+
+    daemon_threads = True
+
+    def __init__(self, address, root, faults, verbose=False):
+        super().__init__(address, OriginHandler)
+        self.root = Path(root)
+        self.faults = faults
+        self.verbose = verbose
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve fixture media like a video site, with fault injection')
+    parser.add_argument('--host', default='0.0.0.0', help='Address to bind (default: 0.0.0.0)')
+    parser.add_argument('--port', type=int, default=8800, help='Port to listen on (default: 8800)')
+    parser.add_argument('--fixtures', default=str(FIXTURES_PATH), help='Fixtures directory')
+    parser.add_argument('--name', default='sample', help='Fixture to build if missing (default: sample)')
+    parser.add_argument('--source', help='Video to build the fixture from (default: synthetic pattern)')
+    parser.add_argument('--duration', type=int, default=60, help='Fixture length in seconds (default: 60)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds before each response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra random latency, up to this many seconds')
+    parser.add_argument('--bandwidth', type=float, default=0, help='Per-connection limit in KB/s (0 = unlimited)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests to fail (0-1)')
+    parser.add_argument('--error-status', type=int, default=503, help='Status of injected failures (default: 503)')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After for injected 429/503 (default: 1)')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    prepare_fixture(args.name, args.source, args.duration, root=args.fixtures)
+    faults = Faults(args.latency, args.jitter, int(args.bandwidth * 1024),
+                    args.error_rate, args.error_status, args.retry_after)
+    server = OriginServer((args.host, args.port), args.fixtures, faults, args.verbose)
+
+    base = f"http://{'localhost' if args.host == '0.0.0.0' else args.host}:{args.port}"
+    print(f"🚀 Mock origin on {base}")
+    print(f"   Progressive: {base}/watch/{args.name}")
+    print(f"   HLS:         {base}/hls/{args.name}/master.m3u8")
+    print(f"   DASH:        {base}/dash/{args.name}/manifest.mpd")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n⏹️ Stopped after {faults.stats['requests']} requests "
+              f"({faults.stats['errors']} injected errors, {faults.stats['bytes'] / 1024 ** 2:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
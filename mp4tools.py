@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+MP4 Layout Tools
+Check and fix the top-level atom order so players can start progressively
+
+Usage: python mp4tools.py video.mp4 [--fix] [--fragmented]
+"""
+
+import argparse
+import os
+import struct
+import subprocess
+import sys
+from pathlib import Path
+
+from accounting import run_metered
+
+MP4_SUFFIXES = {'.mp4', '.m4v', '.m4a', '.mov'}
+
+# ffmpeg -movflags for each progressive layout
+FASTSTART_FLAGS = "+faststart"
+FRAGMENTED_FLAGS = "+frag_keyframe+empty_moov+default_base_moof"
+
+
+def read_atoms(file_path):
+    """List top-level MP4 atoms as (type, offset, size) without reading payloads"""
+    atoms = []
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        offset = 0
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            size, kind = struct.unpack('>I4s', f.read(8))
+            if size == 1:
+                size = struct.unpack('>Q', f.read(8))[0]
+            elif size == 0:
+                size = file_size - offset
+            if size < 8:
+                break
+            atoms.append((kind.decode('latin-1'), offset, size))
+            offset += size
+    return atoms
+
+
+def is_progressive(file_path):
+    """
+    Check that playback can start before the whole file has arrived
+
+    True when the moov atom comes before any media data (faststart), or when
+    the file is fragmented (moov followed by moof/mdat pairs).
+    """
+    for kind, _, _ in read_atoms(file_path):
+        if kind == 'moov':
+            return True
+        if kind in ('mdat', 'moof'):
+            return False
+    return False
+
+
+def is_fragmented(file_path):
+    """Check whether the file is a fragmented MP4 (has moof atoms)"""
+    return any(kind == 'moof' for kind, _, _ in read_atoms(file_path))
+
+
+def remux_progressive(input_file, output_file, fragmented=False):
+    """Remux with stream copy into faststart (or fragmented) layout"""
+    cmd = [
+        "ffmpeg", "-y", "-i", str(input_file),
+        "-map", "0", "-c", "copy",
+        "-movflags", FRAGMENTED_FLAGS if fragmented else FASTSTART_FLAGS,
+        str(output_file)
+    ]
+    try:
+        run_metered(cmd, check=True, capture_output=True)
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"ffmpeg failed: {e}")
+        print(f"stderr: {e.stderr.decode()}")
+        return False
+
+
+def ensure_progressive(file_path, fragmented=False):
+    """
+    Make an MP4 progressive-playback friendly in place
+
+    Already-correct files are left untouched (only their headers are read);
+    others get a cheap stream-copy remux. Non-MP4 files are ignored.
+
+    Returns:
+        True if the file is (now) in the requested layout, False otherwise
+    """
+    file_path = Path(file_path)
+    if file_path.suffix.lower() not in MP4_SUFFIXES:
+        return True
+    if is_progressive(file_path) and is_fragmented(file_path) == fragmented:
+        return True
+
+    layout = "fragmented" if fragmented else "faststart"
+    print(f"⚙️ Remuxing '{file_path.name}' to {layout} layout...")
+    remuxed = file_path.with_name(f".{file_path.stem}.remux{file_path.suffix}")
+    if not remux_progressive(file_path, remuxed, fragmented):
+        remuxed.unlink(missing_ok=True)
+        return False
+    if not is_progressive(remuxed):
+        print(f"❌ Remuxed file is still not progressive: {file_path}")
+        remuxed.unlink(missing_ok=True)
+        return False
+    os.replace(remuxed, file_path)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check MP4 atom order for progressive playback')
+    parser.add_argument('files', nargs='+', help='MP4 files to check')
+    parser.add_argument('--fix', action='store_true', help='Remux files that are not progressive')
+    parser.add_argument('--fragmented', action='store_true', help='With --fix, write fragmented MP4')
+    args = parser.parse_args()
+
+    ok = True
+    for file in args.files:
+        atoms = " ".join(kind for kind, _, _ in read_atoms(file))
+        if args.fix and not ensure_progressive(file, args.fragmented):
+            ok = False
+        progressive = is_progressive(file)
+        ok = ok and progressive
+        print(f"{'✅' if progressive else '❌'} {file}: {atoms}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
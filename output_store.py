@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Output Store
+Retains finished outputs so they can be re-fetched, resumed and shared
+
+Every output lives in its own entry directory together with a small metadata
+file. Entries are looked up by a request key, so repeating a request (or
+resuming it with a Range header) is served from disk instead of re-running
+the download and encode. Files are also indexed by content hash: an output
+identical to one already stored becomes a hardlink to it, so it takes no
+extra space. Old entries are evicted by age and by the total size of the
+distinct files they hold.
+
+All state is on disk, so several processes or containers can share one store.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+from scratch import publish_file
+from dedup import content_hash
+
+OUTPUT_TTL = int(os.environ.get('OUTPUT_TTL_HOURS', '24')) * 3600
+OUTPUT_MAX_BYTES = int(os.environ.get('OUTPUT_MAX_GB', '20')) * 1024 ** 3
+# Entries used this recently are never evicted, so one that was just added or
+# looked up is still there when its response opens it
+OUTPUT_MIN_AGE = int(os.environ.get('OUTPUT_MIN_AGE_SECONDS', '300'))
+
+META_FILE = '.meta.json'
+KEYS_DIR = '.keys'
+HASHES_DIR = '.hashes'
+
+
+def request_key(*parts):
+    """Build a stable cache key from request parameters"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class OutputStore:
+    """
+    Retained output files, addressed by entry id and by request key
+
+    Args:
+        root: Directory holding one sub-directory per entry
+        ttl: Seconds an entry is kept after it was last used
+        max_bytes: Total size above which least recently used entries go first
+        min_age: Seconds after its last use before an entry may be evicted
+    """
+
+    def __init__(self, root, ttl=OUTPUT_TTL, max_bytes=OUTPUT_MAX_BYTES, min_age=OUTPUT_MIN_AGE):
+        self.root = Path(root)
+        self.keys_dir = self.root / KEYS_DIR
+        self.keys_dir.mkdir(parents=True, exist_ok=True)
+        self.hashes_dir = self.root / HASHES_DIR
+        self.hashes_dir.mkdir(exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+
+    def _entry_file(self, entry_id):
+        """Path of the output file in an entry, or None if the entry is gone"""
+        if not entry_id or '/' in entry_id or entry_id.startswith('.'):
+            return None
+        entry_dir = self.root / entry_id
+        try:
+            meta = json.loads((entry_dir / META_FILE).read_text())
+        except (OSError, ValueError):
+            return None
+        path = entry_dir / meta['name']
+        return path if path.exists() else None
+
+    def add(self, path, key=None, extra=None):
+        """
+        Move a finished file into the store
+
+        Args:
+            path: File to retain (moved, not copied)
+            key: Request key to find the entry again (see request_key)
+            extra: Additional metadata to keep with the entry
+
+        Returns:
+            (entry_id, stored path)
+        """
+        entry_id = uuid.uuid4().hex
+        entry_dir = self.root / entry_id
+        stored = publish_file(path, entry_dir)
+        digest = content_hash(stored)
+        if self._link_identical(stored, digest):
+            print(f"♻️ Output identical to a stored one, hardlinked: {stored.name}")
+        meta = dict(extra or {}, key=key, name=stored.name, hash=digest, created=time.time())
+        (entry_dir / META_FILE).write_text(json.dumps(meta))
+
+        if key:
+            self._point(self.keys_dir, key, entry_id)
+        self._point(self.hashes_dir, digest, entry_id)
+        self.evict(keep=(entry_id,))
+        return entry_id, stored
+
+    def _link_identical(self, stored, digest):
+        """Replace `stored` with a hardlink to an already stored file with the same content"""
+        try:
+            existing = self._entry_file((self.hashes_dir / digest).read_text().strip())
+        except OSError:
+            return False
+        if existing is None:
+            return False
+        staged = stored.with_name(f".{stored.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            if os.path.samefile(existing, stored) or existing.stat().st_size != stored.stat().st_size:
+                return False
+            os.link(existing, staged)
+            os.replace(staged, stored)
+            return True
+        except OSError:
+            staged.unlink(missing_ok=True)
+            return False
+
+    def reserve(self, name, extra=None):
+        """
+        Create an entry whose files are written in place, e.g. a growing HLS playlist
+
+        The entry can be served (see member) while it is being written, but is
+        only found by request key once commit() is called.
+
+        Args:
+            name: Main file of the entry (what get() returns once it exists)
+            extra: Additional metadata to keep with the entry
+
+        Returns:
+            (entry_id, entry directory)
+        """
+        entry_id = uuid.uuid4().hex
+        entry_dir = self.root / entry_id
+        entry_dir.mkdir()
+        meta = dict(extra or {}, key=None, name=name, created=time.time())
+        (entry_dir / META_FILE).write_text(json.dumps(meta))
+        return entry_id, entry_dir
+
+    def commit(self, entry_id, key=None):
+        """Finish a reserved entry and make it findable by `key`"""
+        if key:
+            self._point(self.keys_dir, key, entry_id)
+        self.evict(keep=(entry_id,))
+
+    def discard(self, entry_id):
+        """Remove an entry, e.g. a reserved one whose output failed"""
+        if entry_id and '/' not in entry_id and not entry_id.startswith('.'):
+            shutil.rmtree(self.root / entry_id, ignore_errors=True)
+
+    def _point(self, index_dir, name, entry_id):
+        """Point a request key or content hash at an entry"""
+        # Write-then-rename so readers in other processes never see a partial id
+        staged = index_dir / f".{name}.{uuid.uuid4().hex}.tmp"
+        staged.write_text(entry_id)
+        os.replace(staged, index_dir / name)
+
+    def get(self, entry_id):
+        """Stored file for `entry_id`, marking the entry as recently used"""
+        path = self._entry_file(entry_id)
+        if path is not None:
+            os.utime(path.parent)
+        return path
+
+    def member(self, entry_id, name):
+        """Any file inside an entry (e.g. an HLS segment), or None if missing"""
+        if not entry_id or '/' in entry_id or entry_id.startswith('.'):
+            return None
+        if not name or '/' in name or name.startswith('.'):
+            return None
+        path = self.root / entry_id / name
+        return path if path.is_file() else None
+
+    def lookup(self, key):
+        """(entry_id, stored path) for a request key, or None if not retained"""
+        try:
+            entry_id = (self.keys_dir / key).read_text().strip()
+        except OSError:
+            return None
+        path = self.get(entry_id)
+        if path is None:
+            return None
+        return entry_id, path
+
+    def evict(self, keep=()):
+        """
+        Drop expired entries, then least recently used ones until under budget
+
+        Entries in `keep` and entries used within min_age seconds stay, even
+        if that leaves the store over budget for a while.
+        """
+        now = time.time()
+        entries = []
+        # Hardlinked files are counted once and only free space with their last link
+        links = {}
+        for entry_dir in self.root.iterdir():
+            if not entry_dir.is_dir() or entry_dir.name.startswith('.'):
+                continue
+            try:
+                last_used = entry_dir.stat().st_mtime
+                files = {}
+                for f in entry_dir.iterdir():
+                    st = f.stat()
+                    files[(st.st_dev, st.st_ino)] = st.st_size
+            except OSError:
+                continue
+            entries.append((last_used, files, entry_dir))
+            for inode in files:
+                links[inode] = links.get(inode, 0) + 1
+
+        entries.sort(key=lambda entry: entry[0])
+        total = sum({inode: size for _, files, _ in entries for inode, size in files.items()}.values())
+        for last_used, files, entry_dir in entries:
+            if now - last_used < self.min_age or (now - last_used < self.ttl and total <= self.max_bytes):
+                break
+            if entry_dir.name in keep:
+                continue
+            # Open downloads keep their file handle, so removal never cuts a transfer short
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            for inode, size in files.items():
+                links[inode] -= 1
+                if not links[inode]:
+                    total -= size
+            print(f"🗑️ Evicted output: {entry_dir.name}")
+
+        for index_dir in (self.keys_dir, self.hashes_dir):
+            for pointer in index_dir.iterdir():
+                if pointer.name.startswith('.'):
+                    continue
+                try:
+                    if not (self.root / pointer.read_text().strip()).exists():
+                        pointer.unlink()
+                except OSError:
+                    continue
@@ -1,10 +1,15 @@
-import yt_dlp
 import subprocess
 import os
 import sys
 import argparse
+from clips import parse_clip_ranges, cut_clips, get_chapters, split_by_chapters
+from encode_policy import choose_encoding
+from governor import governed_download
+
+def download_youtube_video_1080p(url, download_path=".", chapters_out=None):
+    # Imported here so --help and local-file runs never pay for loading yt-dlp
+    import yt_dlp
 
-def download_youtube_video_1080p(url, download_path="."):
     downloaded_file = None  # full path to the final merged file
 
     ydl_opts = {
@@ -24,7 +29,7 @@ def download_youtube_video_1080p(url, download_path="."):
 
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         try:
-            info = ydl.extract_info(url, download=True)
+            info = governed_download(ydl, url)
             # Try to determine the exact merged output filepath
             requested_downloads = info.get('requested_downloads') or []
             for rd in requested_downloads:
@@ -32,6 +37,9 @@ def download_youtube_video_1080p(url, download_path="."):
                     downloaded_file = rd['filepath']
             if not downloaded_file:
                 downloaded_file = ydl.prepare_filename(info)
+            # Hand the chapter markers back to callers that want to split
+            if chapters_out is not None:
+                chapters_out.extend(info.get('chapters') or [])
             print(f"Downloaded video from: {url}")
         except Exception as e:
             print(f"An error occurred: {e}")
@@ -83,23 +91,28 @@ def get_mp4_files(folder="."):
         if f.endswith(".mp4") and os.path.isfile(os.path.join(folder, f))
     ]
 
-def reencode_to_plex_friendly(input_path, output_path):
-    print(f"⚙️ Re-encoding '{input_path}' to Plex-friendly format...")
+def reencode_to_plex_friendly(input_path, output_path, duration=None, height=None) -> bool:
+    # Preset/CRF from the host's calibration table; an idle CLI run gets the slow presets
+    preset, crf = choose_encoding(duration or 0, height=height)
+    print(f"⚙️ Re-encoding '{input_path}' to Plex-friendly format (preset {preset}, crf {crf})...")
     try:
         subprocess.run(
             [
-                "ffmpeg", "-i", input_path,
+                "ffmpeg", "-y", "-i", input_path,
                 "-c:v", "libx264",
                 "-c:a", "aac",
                 "-movflags", "+faststart",
-                "-preset", "slow",  # can use "fast" for quicker encodes
+                "-preset", preset,
+                "-crf", str(crf),
                 output_path
             ],
             check=True
         )
         print(f"✅ Re-encoded and saved to: {output_path}")
+        return True
     except subprocess.CalledProcessError as e:
         print(f"❌ Re-encoding failed: {e}")
+        return False
 
 
 def trim_video(input_file: str, output_file: str, cut_seconds: int) -> bool:
@@ -141,6 +154,7 @@ def trim_video(input_file: str, output_file: str, cut_seconds: int) -> bool:
         "-i", input_file,  # input file
         "-t", str(new_duration),  # set new duration
         "-c", "copy",      # copy codec (no re-encode)
+        "-movflags", "+faststart",  # moov first for progressive playback
         output_file
     ]
 
@@ -157,21 +171,40 @@ def trim_video(input_file: str, output_file: str, cut_seconds: int) -> bool:
 
 def main():
     parser = argparse.ArgumentParser(description='Download YouTube videos and optionally trim them')
-    parser.add_argument('url', help='YouTube video URL to download')
+    parser.add_argument('url', help='YouTube video URL to download, or a local video file to trim/check')
     parser.add_argument('--trim', '-t', type=int, default=0, 
                        help='Number of seconds to trim from the end (default: 0, no trimming)')
     parser.add_argument('--download-path', '-d', default='.', 
                        help='Directory to save downloaded videos (default: current directory)')
+    parser.add_argument('--clip', '-c', action='append', default=[], metavar='START-END',
+                       help='Cut a clip (HH:MM:SS or seconds), repeat for several clips from one download')
+    parser.add_argument('--split-chapters', action='store_true',
+                       help='Split the video into one file per chapter')
     
     args = parser.parse_args()
+
+    try:
+        clip_ranges = parse_clip_ranges(args.clip) if args.clip else []
+    except ValueError as e:
+        parser.error(str(e))
     
-    print(f"🎬 Downloading video from: {args.url}")
-    print(f"📁 Save location: {args.download_path}")
+    local_file = os.path.isfile(args.url)
+    if local_file:
+        print(f"🎬 Using local file: {args.url}")
+    else:
+        print(f"🎬 Downloading video from: {args.url}")
+        print(f"📁 Save location: {args.download_path}")
     if args.trim > 0:
         print(f"✂️ Will trim {args.trim} seconds from the end")
+    if clip_ranges:
+        print(f"✂️ Will cut {len(clip_ranges)} clips")
     
     # Download the video
-    downloaded = download_youtube_video_1080p(args.url, args.download_path)
+    chapters = []
+    if local_file:
+        downloaded = os.path.abspath(args.url)
+    else:
+        downloaded = download_youtube_video_1080p(args.url, args.download_path, chapters)
     
     if not downloaded or not os.path.isfile(downloaded):
         print("❌ Download failed!")
@@ -200,8 +233,35 @@ def main():
             print("✅ Video successfully trimmed.")
         else:
             print("❌ Trimming failed.")
-    else:
+    elif not clip_ranges and not args.split_chapters:
         print("\n✅ Download completed! (No trimming requested)")
 
+    # Cut all clips from the single download in one ffmpeg pass
+    if clip_ranges:
+        print(f"\n✂️ Cutting {len(clip_ranges)} clips from: {os.path.basename(downloaded)}")
+        clip_files = cut_clips(downloaded, clip_ranges)
+        if clip_files:
+            for clip_file in clip_files:
+                print(f"   {clip_file}")
+            print("✅ Clips successfully cut.")
+        else:
+            print("❌ Cutting clips failed.")
+
+    # Split at chapter boundaries in one ffmpeg pass
+    if args.split_chapters:
+        chapters = chapters or get_chapters(downloaded)
+        if not chapters:
+            print("❌ Video has no chapters to split on.")
+            sys.exit(1)
+        base, _ = os.path.splitext(downloaded)
+        print(f"\n📑 Splitting {len(chapters)} chapters from: {os.path.basename(downloaded)}")
+        part_files = split_by_chapters(downloaded, chapters, f"{base}_chapters")
+        if part_files:
+            for part_file in part_files:
+                print(f"   {part_file}")
+            print("✅ Chapters successfully split.")
+        else:
+            print("❌ Splitting chapters failed.")
+
 if __name__ == "__main__":
     main()
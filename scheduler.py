@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Job Scheduler
+Runs the cheapest pipeline work first, without starving long jobs
+
+Each job's run time is estimated from a metadata-only preflight of its
+source: duration, the format the chosen quality resolves to, trim length and
+whether a Plex re-encode will be needed. Waiting work is then ordered by
+
+    estimated seconds × lane weight − SCHEDULER_AGING × seconds waited
+
+so short clips overtake a long 4K encode, but every job gains priority while
+it waits and eventually runs. Submissions come in two lanes: `interactive`
+(people waiting in the UI) and `batch` (bulk work), which counts as
+SCHEDULER_BATCH_WEIGHT times more expensive and may hold at most
+SCHEDULER_BATCH_SLOTS of the running slots.
+"""
+
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from encode_policy import REFERENCE_PIXELS, choose_encoding, load_speeds
+from governor import GOVERNOR
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+LANES = (INTERACTIVE, BATCH)
+
+# Estimated seconds of priority a job gains per second it waits
+AGING = float(os.environ.get('SCHEDULER_AGING', '1'))
+BATCH_WEIGHT = float(os.environ.get('SCHEDULER_BATCH_WEIGHT', '4'))
+# Running slots batch jobs may hold (default: all but one, so interactive work always has room)
+BATCH_SLOTS = int(os.environ.get('SCHEDULER_BATCH_SLOTS', '0')) or None
+# Assumed cost of jobs whose preflight failed
+DEFAULT_COST = float(os.environ.get('SCHEDULER_DEFAULT_COST', '300'))
+DOWNLOAD_MBPS = float(os.environ.get('SCHEDULER_DOWNLOAD_MBPS', '50'))
+# Fixed per-job overhead: extraction, probing, muxing
+JOB_OVERHEAD = 5.0
+
+PLEX_VIDEO_CODECS = ('avc1', 'h264')
+PLEX_AUDIO_CODECS = ('mp4a', 'aac')
+
+
+def priority_key(cost, lane, created):
+    """
+    Sort key for waiting work (lower runs first)
+
+    Aging is linear and the same for every job, so the key can be computed
+    once at submission: waiting t seconds longer is worth AGING × t.
+    """
+    cost = DEFAULT_COST if cost is None else cost
+    weight = BATCH_WEIGHT if lane == BATCH else 1
+    return cost * weight + AGING * created
+
+
+def preflight(url, format_string, cookiefile=None):
+    """
+    Extract metadata for `url` without downloading it
+
+    Returns:
+        dict with duration, width, height, vcodec, acodec and filesize
+        (bytes) of the format(s) `format_string` selects
+    """
+    import yt_dlp
+
+    ydl_opts = {'format': format_string, 'quiet': True, 'no_warnings': True, 'noplaylist': True}
+    if cookiefile:
+        ydl_opts['cookiefile'] = str(cookiefile)
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = GOVERNOR.call(url, ydl.extract_info, url, download=False)
+
+    duration = info.get('duration') or 0
+    formats = info.get('requested_formats') or [info]
+    vcodec = next((f['vcodec'] for f in formats if f.get('vcodec') not in (None, 'none')), None)
+    acodec = next((f['acodec'] for f in formats if f.get('acodec') not in (None, 'none')), None)
+    filesize = sum(
+        f.get('filesize') or f.get('filesize_approx') or (f.get('tbr') or 0) * 125 * duration
+        for f in formats
+    )
+    return {
+        'duration': duration,
+        'width': info.get('width'),
+        'height': info.get('height'),
+        'vcodec': vcodec,
+        'acodec': acodec,
+        'filesize': filesize,
+    }
+
+
+def span(start, end, duration):
+    """Seconds covered by a start/end range (either side may be open)"""
+    if end is None:
+        end = duration
+    elif duration:
+        end = min(end, duration)
+    return max(end - (start or 0), 0)
+
+
+def encode_seconds(length, width, height):
+    """Predicted time to re-encode `length` seconds of video on an idle host"""
+    if not length:
+        return 0
+    speeds = load_speeds()
+    preset, _ = choose_encoding(length, width, height, speeds=speeds)
+    pixels = (width or 1920) * (height or 1080)
+    return length * (pixels / REFERENCE_PIXELS) / speeds.get(preset, 1)
+
+
+def estimate_cost(kind, params, meta):
+    """
+    Estimated run time in seconds of a pipeline job
+
+    Args:
+        kind: Pipeline kind (download, clips, chapters, hls, preview)
+        params: Parsed pipeline parameters
+        meta: Preflight metadata (see preflight)
+    """
+    duration = meta.get('duration') or 0
+    if kind == 'clips':
+        length = sum(span(start, end, duration) for start, end in params['ranges'])
+    elif kind in ('download', 'hls'):
+        length = span(params.get('start_time'), params.get('end_time'), duration)
+    else:
+        length = duration
+
+    # Pipelines download the whole source first, unless fetching just the trimmed section
+    download_bytes = meta.get('filesize') or 0
+    trimmed = params.get('start_time') is not None or params.get('end_time') is not None
+    section = kind in ('download', 'hls') and params.get('section_download') and trimmed
+    if section and duration:
+        download_bytes *= length / duration
+    cost = JOB_OVERHEAD + download_bytes / (DOWNLOAD_MBPS * 125000)
+
+    vcodec = meta.get('vcodec') or ''
+    acodec = meta.get('acodec') or ''
+    plex_friendly = vcodec.startswith(PLEX_VIDEO_CODECS) and acodec.startswith(PLEX_AUDIO_CODECS)
+    if kind == 'hls' or (params.get('plex_compatible') and not plex_friendly):
+        cost += encode_seconds(length, meta.get('width'), meta.get('height'))
+    return round(cost, 1)
+
+
+class PriorityGate:
+    """
+    Limits how many pipelines run at once and admits waiters cheapest-first
+
+    Args:
+        slots: Pipelines that may run at the same time
+        batch_slots: Of those, how many may be batch jobs (default: slots - 1, at least 1)
+    """
+
+    def __init__(self, slots, batch_slots=BATCH_SLOTS):
+        self.slots = max(1, slots)
+        self.batch_slots = batch_slots or max(1, self.slots - 1)
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._running = {lane: 0 for lane in LANES}
+        self._order = itertools.count()
+
+    def busy(self):
+        """Whether a new arrival would have to wait (so ordering matters)"""
+        with self._cond:
+            return bool(self._waiting) or sum(self._running.values()) >= self.slots
+
+    def _next_ticket(self):
+        """Best waiting ticket whose lane may start now (caller holds the lock)"""
+        if sum(self._running.values()) >= self.slots:
+            return None
+        for ticket in sorted(self._waiting):
+            if ticket[2] == BATCH and self._running[BATCH] >= self.batch_slots:
+                continue
+            return ticket
+        return None
+
+    @contextmanager
+    def slot(self, cost=None, lane=INTERACTIVE, created=None):
+        """
+        Block until this job's turn, then hold a running slot for the block
+
+        Args:
+            cost: Estimated seconds (None = DEFAULT_COST)
+            lane: INTERACTIVE or BATCH
+            created: Submission time the job ages from (default: now)
+        """
+        lane = lane if lane in LANES else INTERACTIVE
+        ticket = (priority_key(cost, lane, created or time.time()), next(self._order), lane)
+        with self._cond:
+            self._waiting.append(ticket)
+            while self._next_ticket() is not ticket:
+                self._cond.wait()
+            self._waiting.remove(ticket)
+            self._running[lane] += 1
+            # Slots may remain for the next waiter in line
+            self._cond.notify_all()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running[lane] -= 1
+                self._cond.notify_all()
+
+    def snapshot(self):
+        """Running and waiting counts per lane, for health output"""
+        with self._cond:
+            waiting = {lane: sum(1 for t in self._waiting if t[2] == lane) for lane in LANES}
+            return {'slots': self.slots, 'running': dict(self._running), 'waiting': waiting}
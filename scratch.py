@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Scratch Space Manager
+Per-job working directories for intermediate files
+
+Intermediates go to a fast tier (tmpfs) when their estimated size fits and
+spill to a disk tier otherwise. Finished outputs are moved into the serving
+directory under a name nobody else is using, in one atomic step.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+# Fast tier is usually a tmpfs mount; disk tier should live on the same
+# filesystem as the serving directory so publishing is a plain rename.
+SCRATCH_FAST_PATH = Path(os.environ.get('SCRATCH_FAST_PATH', '/dev/shm/yt_download'))
+SCRATCH_FAST_RESERVE = int(os.environ.get('SCRATCH_FAST_RESERVE_MB', '256')) * 1024 * 1024
+
+# Bytes promised to running jobs on the fast tier, so concurrent jobs don't overcommit it
+_fast_reserved = 0
+_fast_lock = threading.Lock()
+
+
+def free_bytes(path):
+    """Free space on the filesystem holding `path` (0 if it doesn't exist)"""
+    try:
+        return shutil.disk_usage(path).free
+    except OSError:
+        return 0
+
+
+def publish_file(path, dest_dir, name=None):
+    """
+    Move a finished file into `dest_dir` atomically
+
+    The file appears under its final name only once it is complete. If
+    the name is taken, " (1)", " (2)"... is appended instead of
+    overwriting another job's output.
+
+    Returns:
+        Path of the published file
+    """
+    path = Path(path)
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    name = name or path.name
+
+    # Same filesystem: link in place; otherwise copy next to the destination first
+    staged = dest_dir / f".{name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(path, staged)
+    except OSError:
+        shutil.copyfile(path, staged)
+    path.unlink()
+
+    stem, suffix = os.path.splitext(name)
+    counter = 0
+    while True:
+        target = dest_dir / (f"{stem} ({counter}){suffix}" if counter else name)
+        try:
+            os.link(staged, target)
+            staged.unlink()
+            break
+        except FileExistsError:
+            counter += 1
+        except OSError:
+            # Filesystem without hard links: fall back to a rename
+            if target.exists():
+                counter += 1
+                continue
+            os.replace(staged, target)
+            break
+    print(f"📦 Published: {target}")
+    return target
+
+
+class ScratchSpace:
+    """
+    Working directories for one job
+
+    Use as a context manager; both job directories are removed on exit.
+
+    Args:
+        disk_root: Directory for the disk tier (created if missing)
+        fast_root: Directory for the fast tier (None disables it)
+        fast_reserve: Bytes to always leave free on the fast tier
+    """
+
+    def __init__(self, disk_root, fast_root=SCRATCH_FAST_PATH, fast_reserve=SCRATCH_FAST_RESERVE):
+        disk_root = Path(disk_root)
+        disk_root.mkdir(parents=True, exist_ok=True)
+        self.disk_dir = Path(tempfile.mkdtemp(prefix='job-', dir=disk_root))
+        self.fast_dir = None
+        self.fast_reserve = fast_reserve
+        self._reserved = 0
+
+        if fast_root is not None:
+            try:
+                Path(fast_root).mkdir(parents=True, exist_ok=True)
+                self.fast_dir = Path(tempfile.mkdtemp(prefix='job-', dir=fast_root))
+            except OSError as e:
+                print(f"⚠️ Fast scratch tier unavailable ({e}), using disk only")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+
+    def dir_for(self, estimated_size=None):
+        """Pick the fast tier if `estimated_size` bytes fit there, else the disk tier"""
+        global _fast_reserved
+        if self.fast_dir is None or estimated_size is None:
+            return self.disk_dir
+
+        with _fast_lock:
+            available = free_bytes(self.fast_dir) - _fast_reserved - self.fast_reserve
+            if estimated_size > available:
+                return self.disk_dir
+            _fast_reserved += estimated_size
+            self._reserved += estimated_size
+        return self.fast_dir
+
+    def path(self, name, estimated_size=None):
+        """Path for an intermediate file named `name`"""
+        return self.dir_for(estimated_size) / name
+
+    def publish(self, path, dest_dir, name=None):
+        """Move a finished file out of scratch into `dest_dir` (see publish_file)"""
+        return publish_file(path, dest_dir, name)
+
+    def cleanup(self):
+        """Remove the job directories and release fast tier reservations"""
+        global _fast_reserved
+        for job_dir in (self.disk_dir, self.fast_dir):
+            if job_dir is not None:
+                shutil.rmtree(job_dir, ignore_errors=True)
+        with _fast_lock:
+            _fast_reserved -= self._reserved
+            self._reserved = 0
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Channel Sync
+Mirrors channels and playlists into a folder, fetching only new videos
+
+Each run lists the sources with a flat (metadata-only) playlist extraction,
+skips every video already recorded in the archive index, and downloads,
+trims and Plex-normalizes the rest concurrently. The archive keeps each
+video's output path and codecs, so a daily sync costs roughly the new
+uploads rather than the whole back catalogue.
+
+Usage: python sync.py CHANNEL_OR_PLAYLIST_URL [...] [-d DIR] [--trim N] [--jobs N]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+from pathlib import Path
+
+from clips import safe_file_name
+from governor import GOVERNOR
+from run_orig import download_youtube_video_1080p, get_codec, is_plex_friendly, reencode_to_plex_friendly, trim_video
+
+ARCHIVE_NAME = '.sync_archive.db'
+# Flat entries of these extractors are playlists themselves (channel tabs, playlists)
+NESTED_PLAYLIST_IES = ('YoutubeTab', 'YoutubePlaylist')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    extractor TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    source TEXT,
+    title TEXT,
+    path TEXT,
+    vcodec TEXT,
+    acodec TEXT,
+    synced REAL NOT NULL,
+    PRIMARY KEY (extractor, video_id)
+);
+"""
+
+
+class Archive:
+    """
+    Index of videos already synced, in one SQLite file
+
+    Args:
+        db_path: Archive database (created if missing)
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        """New autocommit connection (sync workers each use their own; wrap in closing())"""
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def known(self, verify=False):
+        """
+        Set of (extractor, video_id) already synced
+
+        With `verify`, videos whose output file has since disappeared are
+        left out so they are fetched again.
+        """
+        with closing(self._connect()) as db:
+            rows = db.execute("SELECT extractor, video_id, path FROM videos").fetchall()
+        return {
+            (extractor, video_id) for extractor, video_id, path in rows
+            if not verify or (path and os.path.isfile(path))
+        }
+
+    def record(self, extractor, video_id, source, title, path, vcodec, acodec):
+        """Add or replace one synced video"""
+        with closing(self._connect()) as db:
+            db.execute(
+                "INSERT OR REPLACE INTO videos "
+                "(extractor, video_id, source, title, path, vcodec, acodec, synced) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (extractor, video_id, source, title, str(path), vcodec, acodec, time.time())
+            )
+
+    def count(self):
+        """Number of videos in the archive"""
+        with closing(self._connect()) as db:
+            return db.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+
+
+def flat_entries(ydl, url):
+    """
+    List the videos of a channel or playlist without extracting each one
+
+    Every listing goes through the governor, like the downloads.
+
+    Returns:
+        (source title, list of flat video entries)
+    """
+    info = GOVERNOR.call(url, ydl.extract_info, url, download=False)
+    title = info.get('title') or info.get('id') or 'Unknown'
+    if info.get('_type') not in ('playlist', 'multi_video'):
+        # A single video URL: sync it like a one-entry playlist
+        return title, [dict(info, ie_key=info.get('extractor_key'))]
+
+    entries = []
+    for entry in info.get('entries') or []:
+        if not entry:
+            continue
+        if entry.get('_type') == 'playlist' or entry.get('ie_key') in NESTED_PLAYLIST_IES:
+            # Channel pages list their tabs (Videos, Shorts, Live) as nested playlists
+            _, nested = flat_entries(ydl, entry.get('url') or entry.get('webpage_url'))
+            entries.extend(nested)
+        elif entry.get('id'):
+            entries.append(entry)
+    return title, entries
+
+
+def list_new_videos(urls, known):
+    """
+    Flat-extract every source and keep the videos not in `known`
+
+    Returns:
+        List of (source url, folder name, entry) for videos to fetch
+    """
+    # Imported here so --help never pays for loading yt-dlp
+    import yt_dlp
+
+    ydl_opts = {'extract_flat': 'in_playlist', 'quiet': True, 'no_warnings': True}
+    if os.path.exists('cookies.txt'):
+        ydl_opts['cookiefile'] = 'cookies.txt'
+
+    new_videos = []
+    seen = set(known)
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        for url in urls:
+            try:
+                title, entries = flat_entries(ydl, url)
+            except Exception as e:
+                print(f"❌ Could not list {url}: {e}")
+                continue
+            fresh = []
+            for entry in entries:
+                key = (entry.get('ie_key') or entry.get('extractor_key'), entry['id'])
+                if key not in seen:
+                    seen.add(key)
+                    fresh.append(entry)
+            print(f"📋 {title}: {len(entries)} videos, {len(fresh)} new")
+            new_videos.extend((url, safe_file_name(title), entry) for entry in fresh)
+    return new_videos
+
+
+def sync_video(source, folder, entry, download_path, trim_seconds=0, plex=True):
+    """
+    Download, trim and Plex-normalize one video
+
+    Returns:
+        (output path, vcodec, acodec), or None if it failed
+    """
+    video_url = entry.get('webpage_url') or entry.get('url')
+    target_dir = Path(download_path) / folder
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    downloaded = download_youtube_video_1080p(video_url, str(target_dir))
+    if not downloaded or not os.path.isfile(downloaded):
+        return None
+    output = downloaded
+    base, ext = os.path.splitext(downloaded)
+
+    if trim_seconds > 0:
+        trimmed = f"{base}.trimmed{ext}"
+        if not trim_video(downloaded, trimmed, trim_seconds):
+            return None
+        os.replace(trimmed, downloaded)
+
+    if plex and not is_plex_friendly(output):
+        plex_file = f"{base}.plex{ext}"
+        # A failed or interrupted encode leaves a partial file that must not replace the original
+        if not reencode_to_plex_friendly(output, plex_file, entry.get('duration')) or not is_plex_friendly(plex_file):
+            if os.path.exists(plex_file):
+                os.remove(plex_file)
+            return None
+        os.replace(plex_file, output)
+
+    return output, get_codec(output, 'v'), get_codec(output, 'a')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync channels and playlists, fetching only new videos')
+    parser.add_argument('urls', nargs='+', help='Channel, playlist or video URLs to mirror')
+    parser.add_argument('--download-path', '-d', default='.',
+                        help='Library folder; each source gets a sub-folder (default: current directory)')
+    parser.add_argument('--archive', help=f'Archive index (default: DOWNLOAD_PATH/{ARCHIVE_NAME})')
+    parser.add_argument('--trim', '-t', type=int, default=0,
+                        help='Seconds to trim from the end of every video (default: 0)')
+    parser.add_argument('--jobs', '-j', type=int, default=2, help='Videos processed at the same time (default: 2)')
+    parser.add_argument('--no-plex', action='store_true', help='Keep original codecs instead of h264/aac')
+    parser.add_argument('--verify', action='store_true', help='Fetch archived videos again if their file is gone')
+    parser.add_argument('--dry-run', '-n', action='store_true', help='Only list the new videos')
+    args = parser.parse_args()
+
+    archive = Archive(args.archive or Path(args.download_path) / ARCHIVE_NAME)
+    print(f"🗂️ Archive: {archive.db_path} ({archive.count()} videos)")
+
+    new_videos = list_new_videos(args.urls, archive.known(args.verify))
+    if not new_videos:
+        print("✅ Everything is up to date")
+        return
+    if args.dry_run:
+        for _, folder, entry in new_videos:
+            print(f"   {folder}/{entry.get('title') or entry['id']}")
+        return
+
+    print(f"\n⬇️ Syncing {len(new_videos)} new videos, {args.jobs} at a time")
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = {
+            pool.submit(sync_video, source, folder, entry, args.download_path, args.trim, not args.no_plex):
+                (source, entry)
+            for source, folder, entry in new_videos
+        }
+        for future in as_completed(futures):
+            source, entry = futures[future]
+            title = entry.get('title') or entry['id']
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"❌ {title}: {e}")
+                result = None
+            if result is None:
+                failed += 1
+                print(f"❌ Failed: {title} (will retry next sync)")
+                continue
+            path, vcodec, acodec = result
+            archive.record(entry.get('ie_key') or entry.get('extractor_key'), entry['id'],
+                           source, title, path, vcodec, acodec)
+            print(f"✅ Synced: {path}")
+
+    print(f"\n📊 {len(new_videos) - failed} synced, {failed} failed")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,19 +4,55 @@ YouTube Downloader Web Interface
 Flask web application for downloading and trimming YouTube videos
 """
 
-from flask import Flask, request, send_file, jsonify, Response
+from flask import Flask, request, send_file, jsonify, Response, url_for, redirect
 import yt_dlp
 import subprocess
 import os
+import shutil
 import sys
 from pathlib import Path
 import tempfile
 import time
+import contextvars
 from werkzeug.utils import secure_filename
+from clips import parse_clip_ranges, cut_clips, bundle_zip, get_chapters, split_by_chapters
+from scratch import ScratchSpace
+from output_store import OutputStore, request_key
+from dedup import canonical_source
+from mp4tools import MP4_SUFFIXES, FASTSTART_FLAGS, ensure_progressive
+from jobs import JobStore, JOB_WORKERS, QUEUED, DONE, FAILED
+from scheduler import PriorityGate, INTERACTIVE, LANES, preflight, estimate_cost
+from governor import GOVERNOR, UpstreamError, FATAL, governed_download
+from encode_policy import choose_encoding, encode_slot
+from job_queue import SqliteJobQueue
+from accounting import ResourceMeter, metering, log_usage, run_metered
+from hls import HLS_PLAYLIST, HLS_SEGMENT_SECONDS, CONTENT_TYPES as HLS_CONTENT_TYPES, encode_hls
 
 app = Flask(__name__)
+# Let a fronting nginx/apache stream files itself (X-Sendfile) when configured
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '0') == '1'
 DOWNLOAD_PATH = Path("/downloads")
 DOWNLOAD_PATH.mkdir(exist_ok=True)
+# Per-job work directories; same volume as DOWNLOAD_PATH so publishing is a rename
+SCRATCH_DISK_PATH = DOWNLOAD_PATH / ".scratch"
+# Finished outputs are retained here for re-download and resume
+OUTPUTS = OutputStore(DOWNLOAD_PATH / "outputs")
+# Pipelines running in this process (direct requests and local jobs) take
+# turns through one gate that admits the cheapest waiting work first
+PIPELINE_GATE = PriorityGate(JOB_WORKERS)
+# Background pipeline runs submitted through /api/jobs. With JOB_QUEUE_DB set
+# jobs go to a shared queue for worker.py processes instead of local threads.
+JOB_QUEUE_DB = os.environ.get('JOB_QUEUE_DB')
+JOBS = SqliteJobQueue(JOB_QUEUE_DB) if JOB_QUEUE_DB else JobStore(gate=PIPELINE_GATE)
+# How often a direct request checks on its queued job in worker mode
+QUEUE_POLL_INTERVAL = 1.0
+# Seconds a direct request waits for a worker to claim its job before failing
+QUEUE_CLAIM_TIMEOUT = float(os.environ.get('QUEUE_CLAIM_TIMEOUT', '600'))
+COOKIES_FILE = Path('/app/cookies.txt')
+
+# Videos at least this long (seconds) are re-encoded in parallel chunks
+PARALLEL_ENCODE_MIN_DURATION = int(os.environ.get('PARALLEL_ENCODE_MIN_DURATION', '600'))
+PARALLEL_ENCODE_WORKERS = int(os.environ.get('PARALLEL_ENCODE_WORKERS', str(os.cpu_count() or 1)))
 
 # Quality format mappings for yt-dlp
 QUALITY_FORMATS = {
@@ -26,6 +62,8 @@ QUALITY_FORMATS = {
     '4k': 'bestvideo[height<=2160][ext=mp4]+bestaudio[ext=m4a]/best[height<=2160][ext=mp4]',
     'best': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]'
 }
+# Smallest playable rendition with audio, for scrubbing to find trim points
+PREVIEW_FORMAT = 'worst[ext=mp4][height>=240]/worst[ext=mp4]/worst'
 
 def parse_time(time_str):
     """Convert time string (HH:MM:SS or seconds) to seconds"""
@@ -47,24 +85,45 @@ def parse_time(time_str):
 
 def download_youtube_video(url, quality='1080p', download_path=DOWNLOAD_PATH):
     """Download YouTube video with specified quality"""
+    filepath, _ = download_youtube_video_with_info(url, quality, download_path)
+    return filepath
+
+def download_youtube_video_with_info(url, quality='1080p', download_path=DOWNLOAD_PATH, progress_hook=None,
+                                     section=None, format_string=None):
+    """
+    Download YouTube video and also return the yt-dlp info dict (chapters etc.)
+
+    With `section` (start, end in seconds, either may be None) only that
+    range is fetched, cut at keyframes without re-encoding like a regular
+    trim. `format_string` overrides the format picked from `quality`.
+    """
     download_path = Path(download_path)
     download_path.mkdir(exist_ok=True)
     
-    format_string = QUALITY_FORMATS.get(quality, QUALITY_FORMATS['1080p'])
+    format_string = format_string or QUALITY_FORMATS.get(quality, QUALITY_FORMATS['1080p'])
     
     ydl_opts = {
         'format': format_string,
         'outtmpl': str(download_path / '%(title)s.%(ext)s'),
         'merge_output_format': 'mp4',
+        # A watch URL opened from a playlist means that one video, as in its request key
+        'noplaylist': True,
     }
+    if progress_hook:
+        ydl_opts['progress_hooks'] = [progress_hook]
+    if section:
+        start_time, end_time = section
+        ydl_opts['download_ranges'] = yt_dlp.utils.download_range_func(
+            None, [(start_time or 0, float('inf') if end_time is None else end_time)]
+        )
     
     # Add cookies file if it exists
-    cookies_file = Path('/app/cookies.txt')
-    if cookies_file.exists():
-        ydl_opts['cookiefile'] = str(cookies_file)
+    if COOKIES_FILE.exists():
+        ydl_opts['cookiefile'] = str(COOKIES_FILE)
     
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(url, download=True)
+        # Retries, per-host throttling and circuit breaking shared by all extractions
+        info = governed_download(ydl, url)
         # Get the actual downloaded file path
         requested_downloads = info.get('requested_downloads') or []
         if requested_downloads and requested_downloads[0].get('filepath'):
@@ -72,12 +131,12 @@ def download_youtube_video(url, quality='1080p', download_path=DOWNLOAD_PATH):
         else:
             filepath = ydl.prepare_filename(info)
         
-        return Path(filepath)
+        return Path(filepath), info
 
 def get_video_duration(file_path):
     """Get video duration in seconds using ffprobe"""
     try:
-        result = subprocess.run(
+        result = run_metered(
             ["ffprobe", "-v", "error", "-show_entries", "format=duration",
              "-of", "default=noprint_wrappers=1:nokey=1", str(file_path)],
             stdout=subprocess.PIPE,
@@ -93,7 +152,7 @@ def get_video_duration(file_path):
 def get_codec(file_path, stream_type):
     """Get codec for video or audio stream"""
     try:
-        result = subprocess.run(
+        result = run_metered(
             [
                 "ffprobe", "-v", "error",
                 "-select_streams", f"{stream_type}:0",
@@ -130,29 +189,168 @@ def is_plex_friendly(file_path):
         print(f"❌ Not Plex-friendly (video: {vcodec}, audio: {acodec})")
         return False
 
-def reencode_to_plex_friendly(input_path, output_path):
-    """Re-encode video to Plex-friendly format (h264/aac)"""
-    print(f"⚙️ Re-encoding '{input_path}' to Plex-friendly format...")
+def get_video_size(file_path):
+    """Get (width, height) of the first video stream using ffprobe"""
     try:
-        subprocess.run(
-            [
-                "ffmpeg", "-y", "-i", str(input_path),
-                "-c:v", "libx264",
-                "-c:a", "aac",
-                "-movflags", "+faststart",
-                "-preset", "fast",  # Use 'fast' for quicker encodes
-                str(output_path)
-            ],
-            check=True,
-            capture_output=True
+        result = run_metered(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=width,height",
+             "-of", "csv=s=x:p=0", str(file_path)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True
         )
-        print(f"✅ Re-encoded and saved to: {output_path}")
+        width, height = result.stdout.strip().split('x')[:2]
+        return int(width), int(height)
+    except Exception as e:
+        print(f"Error getting video size: {e}")
+        return None, None
+
+def reencode_to_plex_friendly(input_path, output_path, deadline=None):
+    """
+    Re-encode video to Plex-friendly format (h264/aac)
+
+    The x264 preset and CRF come from the encode policy: slower presets when
+    the host is idle, faster ones when encodes pile up or `deadline`
+    (seconds) is tight.
+    """
+    duration = get_video_duration(input_path)
+    width, height = get_video_size(input_path)
+
+    with encode_slot() as queue_depth:
+        # Encodes already running keep their share of the cores
+        cpu_share = max(1, (os.cpu_count() or 1) // (queue_depth + 1))
+        workers = min(PARALLEL_ENCODE_WORKERS, cpu_share)
+        parallel = workers > 1 and duration and duration >= PARALLEL_ENCODE_MIN_DURATION
+        preset, crf = choose_encoding(
+            duration, width, height, queue_depth, deadline,
+            parallelism=workers if parallel else 1
+        )
+        print(f"🎛️ Encode policy: preset={preset}, crf={crf} (other encodes running: {queue_depth})")
+
+        if parallel:
+            if reencode_to_plex_friendly_parallel(input_path, output_path, duration, workers,
+                                                  preset=preset, crf=crf, threads=cpu_share):
+                return True
+            print("⚠️ Parallel re-encode failed, falling back to a single encoder")
+
+        print(f"⚙️ Re-encoding '{input_path}' to Plex-friendly format...")
+        try:
+            run_metered(
+                [
+                    "ffmpeg", "-y", "-i", str(input_path),
+                    "-c:v", "libx264",
+                    "-c:a", "aac",
+                    "-movflags", "+faststart",
+                    "-preset", preset,
+                    "-crf", str(crf),
+                    str(output_path)
+                ],
+                check=True,
+                capture_output=True
+            )
+            print(f"✅ Re-encoded and saved to: {output_path}")
+            return True
+        except subprocess.CalledProcessError as e:
+            print(f"❌ Re-encoding failed: {e}")
+            print(f"stderr: {e.stderr.decode()}")
+            return False
+
+def run_ffmpeg(cmd):
+    """Run an ffmpeg command, printing stderr on failure"""
+    try:
+        run_metered(cmd, check=True, capture_output=True)
         return True
     except subprocess.CalledProcessError as e:
-        print(f"❌ Re-encoding failed: {e}")
+        print(f"ffmpeg failed: {e}")
         print(f"stderr: {e.stderr.decode()}")
         return False
 
+def reencode_to_plex_friendly_parallel(input_path, output_path, duration=None, workers=None,
+                                       preset='fast', crf=23, threads=None):
+    """
+    Re-encode a long video by encoding keyframe-aligned chunks in parallel
+
+    The video stream is split at keyframes with stream copy, every chunk is
+    encoded by its own libx264 process, and the results are concatenated
+    losslessly. Audio is encoded once as a separate stream so chunk
+    boundaries never leave gaps in it. The encoders share `threads` threads
+    (default: one per CPU).
+
+    Returns:
+        True if successful, False otherwise
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    workers = workers or PARALLEL_ENCODE_WORKERS
+    duration = duration or get_video_duration(input_path)
+    if not duration:
+        return False
+
+    output_path = Path(output_path)
+    work_dir = Path(tempfile.mkdtemp(prefix='encode-', dir=output_path.parent))
+    threads_per_encoder = max(1, (threads or os.cpu_count() or 1) // workers)
+    print(f"⚙️ Re-encoding '{input_path}' in parallel ({workers} encoders)...")
+
+    try:
+        # 1. Cut the video stream into chunks at the first keyframe after each mark
+        chunk_pattern = work_dir / "chunk%04d.mkv"
+        if not run_ffmpeg([
+            "ffmpeg", "-y", "-i", str(input_path),
+            "-map", "0:v:0", "-c", "copy",
+            "-f", "segment", "-segment_time", str(duration / workers),
+            "-reset_timestamps", "1",
+            str(chunk_pattern)
+        ]):
+            return False
+        chunks = sorted(work_dir.glob("chunk*.mkv"))
+
+        # 2. Encode audio and every video chunk concurrently
+        has_audio = bool(get_codec(input_path, 'a'))
+        audio_file = work_dir / "audio.m4a"
+
+        def encode_audio():
+            return run_ffmpeg([
+                "ffmpeg", "-y", "-i", str(input_path),
+                "-map", "0:a:0", "-vn", "-c:a", "aac",
+                str(audio_file)
+            ])
+
+        def encode_chunk(chunk):
+            return run_ffmpeg([
+                "ffmpeg", "-y", "-i", str(chunk),
+                "-c:v", "libx264", "-preset", preset, "-crf", str(crf),
+                "-threads", str(threads_per_encoder),
+                str(chunk.with_name(f"enc_{chunk.name}"))
+            ])
+
+        # Each task runs in a copy of this context so its ffmpeg is charged to the job
+        with ThreadPoolExecutor(max_workers=workers + 1) as pool:
+            audio_job = pool.submit(contextvars.copy_context().run, encode_audio) if has_audio else None
+            encoded = [pool.submit(contextvars.copy_context().run, encode_chunk, chunk) for chunk in chunks]
+            if not all(future.result() for future in encoded):
+                return False
+            if audio_job and not audio_job.result():
+                return False
+
+        # 3. Concatenate the encoded chunks and mux the audio back in
+        concat_list = work_dir / "chunks.txt"
+        concat_list.write_text("".join(
+            f"file '{chunk.with_name(f'enc_{chunk.name}')}'\n" for chunk in chunks
+        ))
+        cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(concat_list)]
+        if has_audio:
+            cmd.extend(["-i", str(audio_file), "-map", "0:v:0", "-map", "1:a:0"])
+        cmd.extend(["-c", "copy", "-movflags", "+faststart", str(output_path)])
+        if not run_ffmpeg(cmd):
+            return False
+
+        print(f"✅ Re-encoded {len(chunks)} chunks and saved to: {output_path}")
+        return True
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
 def trim_video(input_file, output_file, start_time=None, end_time=None):
     """
     Trim video using ffmpeg
@@ -185,12 +383,18 @@ def trim_video(input_file, output_file, start_time=None, end_time=None):
             # Just use end time as duration
             cmd.extend(["-t", str(end_time)])
     
-    cmd.extend(["-c", "copy", str(output_file)])
+    cmd.extend(["-c", "copy"])
+    
+    # Put the moov atom first so players can start before the download ends
+    if Path(output_file).suffix.lower() in MP4_SUFFIXES:
+        cmd.extend(["-movflags", FASTSTART_FLAGS])
+    
+    cmd.append(str(output_file))
     
     print(f"Running: {' '.join(cmd)}")
     
     try:
-        subprocess.run(cmd, check=True, capture_output=True)
+        run_metered(cmd, check=True, capture_output=True)
         print(f"Trimmed video saved to: {output_file}")
         return True
     except subprocess.CalledProcessError as e:
@@ -373,6 +577,21 @@ def index():
             border: 1px solid #f5c6cb;
         }
         
+        .progress {
+            height: 6px;
+            background: #e0e0e0;
+            border-radius: 3px;
+            overflow: hidden;
+            margin-top: 10px;
+        }
+        
+        .progress-bar {
+            height: 100%;
+            width: 0%;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            transition: width 0.3s ease;
+        }
+        
         .hint {
             font-size: 0.8em;
             color: #999;
@@ -413,7 +632,37 @@ def index():
         .checkbox-label span {
             flex: 1;
         }
+        
+        .btn-secondary {
+            background: white;
+            color: #667eea;
+            border: 2px solid #667eea;
+        }
+        
+        .player {
+            display: none;
+            width: 100%;
+            margin-top: 20px;
+            border-radius: 10px;
+            background: black;
+        }
+        
+        .player.active {
+            display: block;
+        }
+        
+        .preview-controls {
+            display: none;
+            grid-template-columns: 1fr 1fr;
+            gap: 15px;
+        }
+        
+        .preview-controls.active {
+            display: grid;
+        }
     </style>
+    <!-- HLS playback for browsers without native support (everything but Safari), served locally -->
+    <script src="/static/hls.js"></script>
 </head>
 <body>
     <div class="container">
@@ -486,14 +735,28 @@ def index():
             <button type="submit" class="btn" id="downloadBtn">
                 Download Video
             </button>
+            <button type="button" class="btn btn-secondary" id="watchBtn">
+                Watch Now
+            </button>
+            <button type="button" class="btn btn-secondary" id="previewBtn">
+                Preview to Pick Trim Points
+            </button>
         </form>
         
         <div class="loading" id="loading">
             <div class="spinner"></div>
             <p id="loadingText">Processing your request...</p>
+            <div class="progress"><div class="progress-bar" id="progressBar"></div></div>
         </div>
         
         <div class="status" id="status"></div>
+        
+        <video class="player" id="player" controls playsinline></video>
+        
+        <div class="preview-controls" id="previewControls">
+            <button type="button" class="btn btn-secondary" id="setStartBtn">Set Start Here</button>
+            <button type="button" class="btn btn-secondary" id="setEndBtn">Set End Here</button>
+        </div>
     </div>
     
     <script>
@@ -502,17 +765,118 @@ def index():
         const statusDiv = document.getElementById('status');
         const downloadBtn = document.getElementById('downloadBtn');
         const loadingText = document.getElementById('loadingText');
+        const progressBar = document.getElementById('progressBar');
+        const watchBtn = document.getElementById('watchBtn');
+        const player = document.getElementById('player');
+        const previewBtn = document.getElementById('previewBtn');
+        const previewControls = document.getElementById('previewControls');
+        let hlsPlayer = null;
+        // URL whose preview was used to pick the trim points
+        let previewedUrl = null;
         
-        form.addEventListener('submit', async (e) => {
-            e.preventDefault();
-            
+        const STAGE_LABELS = {
+            queued: 'Waiting in queue...',
+            preflight: 'Estimating job size...',
+            starting: 'Starting...',
+            downloading: 'Downloading video...',
+            trimming: 'Trimming video...',
+            splitting: 'Splitting chapters...',
+            checking: 'Checking Plex compatibility...',
+            encoding: 'Re-encoding for Plex...',
+            streaming: 'Encoding while you watch...',
+            finalizing: 'Preparing download...'
+        };
+        
+        const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+        
+        function showProgress(job) {
+            let text = STAGE_LABELS[job.stage] || 'Processing your request...';
+            if (job.progress !== null && job.progress !== undefined) {
+                text += ` ${Math.round(job.progress)}%`;
+                progressBar.style.width = `${job.progress}%`;
+            } else {
+                progressBar.style.width = '0%';
+            }
+            loadingText.textContent = text;
+        }
+        
+        async function waitForJob(statusUrl, isReady) {
+            while (true) {
+                const response = await fetch(statusUrl);
+                const job = await response.json();
+                if (!response.ok) {
+                    throw new Error(job.error || 'Lost track of the job');
+                }
+                if (job.status === 'done' || (isReady && isReady(job))) {
+                    return job;
+                }
+                if (job.status === 'error') {
+                    throw new Error(job.error || 'Download failed');
+                }
+                showProgress(job);
+                await sleep(1000);
+            }
+        }
+        
+        function saveFile(fileUrl, filename) {
+            // A plain link lets the browser's download manager stream the
+            // file straight to disk instead of buffering it in memory
+            const a = document.createElement('a');
+            a.href = fileUrl;
+            a.download = filename;
+            document.body.appendChild(a);
+            a.click();
+            document.body.removeChild(a);
+        }
+        
+        function playHls(playlistUrl) {
+            previewControls.classList.remove('active');
+            player.classList.add('active');
+            if (player.canPlayType('application/vnd.apple.mpegurl')) {
+                player.src = playlistUrl;
+            } else if (window.Hls && Hls.isSupported()) {
+                if (hlsPlayer) hlsPlayer.destroy();
+                hlsPlayer = new Hls();
+                hlsPlayer.loadSource(playlistUrl);
+                hlsPlayer.attachMedia(player);
+            } else {
+                throw new Error('This browser cannot play HLS');
+            }
+            player.play().catch(() => {});
+        }
+        
+        function showPreview(fileUrl) {
+            // A plain progressive file: the player seeks in it with range requests
+            if (hlsPlayer) {
+                hlsPlayer.destroy();
+                hlsPlayer = null;
+            }
+            player.src = fileUrl;
+            player.classList.add('active');
+            previewControls.classList.add('active');
+        }
+        
+        function buildParams(kind) {
             // Get form data
-            const url = document.getElementById('url').value;
-            const quality = document.getElementById('quality').value;
             const startTime = document.getElementById('start_time').value;
             const endTime = document.getElementById('end_time').value;
-            const plexCompatible = document.getElementById('plex_compatible').checked;
+            const params = new URLSearchParams({
+                kind: kind,
+                url: document.getElementById('url').value,
+                quality: document.getElementById('quality').value,
+                plex_compatible: document.getElementById('plex_compatible').checked ? '1' : '0'
+            });
             
+            if (startTime) params.append('start_time', startTime);
+            if (endTime) params.append('end_time', endTime);
+            // Points picked on the preview: fetch only that range, not the whole video
+            if ((startTime || endTime) && params.get('url') === previewedUrl) {
+                params.append('section_download', '1');
+            }
+            return params;
+        }
+        
+        async function startJob(params, isReady) {
             // Reset status
             statusDiv.className = 'status';
             statusDiv.textContent = '';
@@ -520,60 +884,91 @@ def index():
             // Show loading
             loadingDiv.classList.add('active');
             downloadBtn.disabled = true;
-            loadingText.textContent = 'Downloading video...';
+            watchBtn.disabled = true;
+            previewBtn.disabled = true;
+            showProgress({stage: 'queued'});
             
-            // Build query params
-            const params = new URLSearchParams({
-                url: url,
-                quality: quality,
-                plex_compatible: plexCompatible ? '1' : '0'
-            });
+            const response = await fetch('/api/jobs', {method: 'POST', body: params});
+            const submitted = await response.json();
             
-            if (startTime) params.append('start_time', startTime);
-            if (endTime) params.append('end_time', endTime);
+            if (!response.ok) {
+                throw new Error(submitted.error || 'Download failed');
+            }
             
+            return waitForJob(response.headers.get('Location') || `/api/jobs/${submitted.id}`, isReady);
+        }
+        
+        function finishJob() {
+            loadingDiv.classList.remove('active');
+            downloadBtn.disabled = false;
+            watchBtn.disabled = false;
+            previewBtn.disabled = false;
+        }
+        
+        watchBtn.addEventListener('click', async () => {
+            if (!form.reportValidity()) return;
             try {
-                const response = await fetch(`/api/download?${params}`);
-                
-                if (!response.ok) {
-                    const error = await response.json();
-                    throw new Error(error.error || 'Download failed');
-                }
-                
-                // Update loading text
-                loadingText.textContent = 'Preparing download...';
-                
-                // Get filename from header
-                const contentDisposition = response.headers.get('Content-Disposition');
-                let filename = 'video.mp4';
-                if (contentDisposition) {
-                    const matches = /filename[^;=\\n]*=((['"]).*?\\2|[^;\\n]*)/.exec(contentDisposition);
-                    if (matches && matches[1]) {
-                        filename = matches[1].replace(/['"]/g, '');
-                    }
-                }
-                
-                // Download the file
-                const blob = await response.blob();
-                const downloadUrl = window.URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = downloadUrl;
-                a.download = filename;
-                document.body.appendChild(a);
-                a.click();
-                window.URL.revokeObjectURL(downloadUrl);
-                document.body.removeChild(a);
+                // Playback starts with the first segment; encoding carries on behind it
+                const job = await startJob(buildParams('hls'), (job) => Boolean(job.playlist_url));
+                playHls(job.playlist_url);
+                statusDiv.className = 'status success active';
+                statusDiv.textContent = '▶️ Playing while the rest is encoded';
+            } catch (error) {
+                statusDiv.className = 'status error active';
+                statusDiv.textContent = `❌ Error: ${error.message}`;
+            } finally {
+                finishJob();
+            }
+        });
+        
+        previewBtn.addEventListener('click', async () => {
+            if (!form.reportValidity()) return;
+            try {
+                const params = new URLSearchParams({
+                    kind: 'preview',
+                    url: document.getElementById('url').value
+                });
+                const job = await startJob(params);
+                showPreview(job.file_url);
+                previewedUrl = params.get('url');
+                statusDiv.className = 'status success active';
+                statusDiv.textContent = '🎞️ Scrub the preview, set start and end, then download in full quality';
+            } catch (error) {
+                statusDiv.className = 'status error active';
+                statusDiv.textContent = `❌ Error: ${error.message}`;
+            } finally {
+                finishJob();
+            }
+        });
+        
+        document.getElementById('setStartBtn').addEventListener('click', () => {
+            document.getElementById('start_time').value = player.currentTime.toFixed(1);
+        });
+        
+        document.getElementById('setEndBtn').addEventListener('click', () => {
+            document.getElementById('end_time').value = player.currentTime.toFixed(1);
+        });
+        
+        form.addEventListener('submit', async (e) => {
+            e.preventDefault();
+            
+            try {
+                const job = await startJob(buildParams('download'));
+                saveFile(job.file_url, job.filename);
                 
-                // Show success
+                // Show success, with a direct link in case the save was blocked
                 statusDiv.className = 'status success active';
-                statusDiv.textContent = '✅ Download complete! Check your downloads folder.';
+                statusDiv.textContent = '✅ Download started! Check your downloads folder. ';
+                const link = document.createElement('a');
+                link.href = job.file_url;
+                link.textContent = 'Direct link';
+                statusDiv.appendChild(link);
                 
             } catch (error) {
                 statusDiv.className = 'status error active';
                 statusDiv.textContent = `❌ Error: ${error.message}`;
             } finally {
-                loadingDiv.classList.remove('active');
-                downloadBtn.disabled = false;
+                finishJob();
             }
         });
     </script>
@@ -582,32 +977,217 @@ def index():
     """
     return html
 
-@app.route('/api/download')
-def download():
-    """Download endpoint - handles video download and trimming"""
+def estimate_trimmed_size(video_file, start_time=None, end_time=None):
+    """Estimate the size of a stream-copied cut from the source bitrate"""
+    size = video_file.stat().st_size
+    duration = get_video_duration(video_file)
+    if not duration:
+        return size
+    start = start_time or 0
+    end = min(end_time, duration) if end_time is not None else duration
+    return int(size * max(end - start, 0) / duration)
+
+def estimate_reencoded_size(input_file):
+    """Rough upper bound for a Plex re-encode (h264 is often bigger than VP9/AV1)"""
+    return int(Path(input_file).stat().st_size * 1.5)
+
+def reencode_files_to_plex_friendly(files):
+    """Re-encode several files to Plex-friendly format, replacing the originals"""
+    plex_files = []
+    for file in files:
+        plex_file = file.parent / f"{file.stem}_plex{file.suffix}"
+        if not reencode_to_plex_friendly(file, plex_file):
+            for leftover in files + plex_files:
+                leftover.unlink(missing_ok=True)
+            return None
+        file.unlink()
+        plex_files.append(plex_file)
+    return plex_files
+
+def send_output(entry_id, output_file):
+    """
+    Send a retained output file
+
+    Responses are conditional: Range/206, ETag/If-None-Match and If-Range
+    are honoured, so interrupted or parallel-range downloads only fetch the
+    missing bytes. The file body goes through the server's file wrapper
+    (sendfile) or X-Sendfile when USE_X_SENDFILE is set.
+    """
+    print(f"Sending file: {output_file}")
+    response = send_file(
+        output_file,
+        as_attachment=True,
+        download_name=output_file.name,
+        conditional=True,
+        etag=True
+    )
+    response.headers['Content-Location'] = url_for('get_output', entry_id=entry_id)
+    return response
+
+def new_scratch_space():
+    """Scratch space for one request, with its disk tier next to the serving directory"""
+    return ScratchSpace(SCRATCH_DISK_PATH)
+
+class PipelineError(Exception):
+    """A pipeline step failed; `status` is the HTTP status to report"""
+
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.status = status
+
+def no_report(stage, progress=None, **fields):
+    """Progress callback for pipelines run without anyone watching"""
+
+def flag(args, name, default):
+    """Read a boolean request parameter ('1'/'0', 'true'/'false' or JSON bool)"""
+    value = args.get(name, default)
+    return str(value).lower() in ('1', 'true', 'on')
+
+def parse_deadline(args):
+    """Optional encode deadline in seconds"""
+    value = args.get('deadline')
+    if value in (None, ''):
+        return None
     try:
-        # Get parameters
-        url = request.args.get('url')
-        quality = request.args.get('quality', '1080p')
-        start_time_str = request.args.get('start_time')
-        end_time_str = request.args.get('end_time')
-        plex_compatible = request.args.get('plex_compatible', '1') == '1'
-        
-        if not url:
-            return jsonify({'error': 'Missing URL parameter'}), 400
-        
-        # Parse times
-        start_time = parse_time(start_time_str) if start_time_str else None
-        end_time = parse_time(end_time_str) if end_time_str else None
-        
-        print(f"Download request: URL={url}, Quality={quality}, Start={start_time}, End={end_time}, Plex={plex_compatible}")
-        
-        # Download video
+        return float(value)
+    except ValueError:
+        raise PipelineError('Invalid deadline', 400)
+
+def parse_download_params(args):
+    """Validate /api/download parameters into a pipeline params dict"""
+    url = args.get('url')
+    if not url:
+        raise PipelineError('Missing URL parameter', 400)
+    try:
+        start_time = parse_time(args.get('start_time'))
+        end_time = parse_time(args.get('end_time'))
+    except ValueError:
+        raise PipelineError('Invalid start or end time', 400)
+    return {
+        'url': url,
+        'quality': args.get('quality', '1080p'),
+        'start_time': start_time,
+        'end_time': end_time,
+        'plex_compatible': flag(args, 'plex_compatible', '1'),
+        'fragmented': flag(args, 'fragmented', '0'),
+        'deadline': parse_deadline(args),
+        'section_download': flag(args, 'section_download', '0'),
+    }
+
+def parse_clips_params(args):
+    """Validate /api/clips parameters into a pipeline params dict"""
+    url = args.get('url')
+    if not url:
+        raise PipelineError('Missing URL parameter', 400)
+    if not args.get('clips'):
+        raise PipelineError('Missing clips parameter', 400)
+    try:
+        ranges = parse_clip_ranges(args.get('clips'))
+    except ValueError as e:
+        raise PipelineError(str(e), 400)
+    return {
+        'url': url,
+        'quality': args.get('quality', '1080p'),
+        'ranges': [list(r) for r in ranges],
+        'plex_compatible': flag(args, 'plex_compatible', '1'),
+    }
+
+def parse_chapters_params(args):
+    """Validate /api/chapters parameters into a pipeline params dict"""
+    url = args.get('url')
+    if not url:
+        raise PipelineError('Missing URL parameter', 400)
+    return {
+        'url': url,
+        'quality': args.get('quality', '1080p'),
+        'plex_compatible': flag(args, 'plex_compatible', '1'),
+    }
+
+def parse_hls_params(args):
+    """Validate HLS job parameters into a pipeline params dict"""
+    params = parse_download_params(args)
+    return {name: params[name] for name in ('url', 'quality', 'start_time', 'end_time', 'section_download')}
+
+def parse_preview_params(args):
+    """Validate preview parameters into a pipeline params dict"""
+    url = args.get('url')
+    if not url:
+        raise PipelineError('Missing URL parameter', 400)
+    return {'url': url}
+
+def download_section(params):
+    """(start, end) to download instead of the whole video, or None"""
+    start_time = params.get('start_time')
+    end_time = params.get('end_time')
+    if not params.get('section_download') or (start_time is None and end_time is None):
+        return None
+    return start_time, end_time
+
+def estimate_job_cost(kind, params):
+    """Preflight a job's source and estimate its run time in seconds (None if unknown)"""
+    if kind == 'preview':
+        format_string = PREVIEW_FORMAT
+    else:
+        format_string = QUALITY_FORMATS.get(params['quality'], QUALITY_FORMATS['1080p'])
+    cookiefile = COOKIES_FILE if COOKIES_FILE.exists() else None
+    try:
+        meta = preflight(params['url'], format_string, cookiefile)
+    except Exception as e:
+        print(f"Preflight failed, scheduling with the default cost: {e}")
+        return None
+    cost = estimate_cost(kind, params, meta)
+    print(f"Preflight: {kind} job estimated at {cost:.0f}s")
+    return cost
+
+def download_progress_hook(report):
+    """yt-dlp progress hook that forwards download percentage to `report`"""
+    def hook(d):
+        if d.get('status') != 'downloading':
+            return
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        if total:
+            report('downloading', round(100 * d.get('downloaded_bytes', 0) / total, 1))
+    return hook
+
+def run_download_pipeline(params, report=no_report):
+    """
+    Download, trim and Plex-normalize one video
+
+    Returns:
+        (entry_id, output_file) of the retained output
+    """
+    url = params['url']
+    quality = params['quality']
+    start_time = params['start_time']
+    end_time = params['end_time']
+    plex_compatible = params['plex_compatible']
+    fragmented = params['fragmented']
+
+    print(f"Download request: URL={url}, Quality={quality}, Start={start_time}, End={end_time}, Plex={plex_compatible}")
+    
+    # Repeated and resumed requests are served from the retained output, also
+    # when the same video is requested through a different URL
+    key = request_key('download', canonical_source(url), quality, start_time, end_time, plex_compatible, fragmented,
+                      bool(download_section(params)))
+    cached = OUTPUTS.lookup(key)
+    if cached:
+        print("Serving retained output")
+        return cached
+    
+    with new_scratch_space() as scratch:
+        # Download video (only the requested range when trimming)
         print("Downloading video...")
-        video_file = download_youtube_video(url, quality, DOWNLOAD_PATH)
+        report('downloading')
+        section = download_section(params)
+        video_file, _ = download_youtube_video_with_info(
+            url, quality, scratch.disk_dir, download_progress_hook(report), section
+        )
         
         if not video_file.exists():
-            return jsonify({'error': 'Download failed'}), 500
+            raise PipelineError('Download failed')
+        if section:
+            # Already cut to the range
+            start_time = end_time = None
         
         # Determine output file
         output_file = video_file
@@ -615,68 +1195,449 @@ def download():
         # Trim if needed
         if start_time is not None or end_time is not None:
             print(f"Trimming video: start={start_time}, end={end_time}")
-            trimmed_file = video_file.parent / f"{video_file.stem}_trimmed{video_file.suffix}"
+            report('trimming')
+            trimmed_file = scratch.path(
+                f"{video_file.stem}_trimmed{video_file.suffix}",
+                estimate_trimmed_size(video_file, start_time, end_time)
+            )
             
             if trim_video(video_file, trimmed_file, start_time, end_time):
                 # Use trimmed file and delete original
                 video_file.unlink()
                 output_file = trimmed_file
             else:
-                return jsonify({'error': 'Trimming failed'}), 500
+                raise PipelineError('Trimming failed')
         
         # Check Plex compatibility if requested
         if plex_compatible:
             print("Checking Plex compatibility...")
+            report('checking')
             if not is_plex_friendly(output_file):
                 print("Re-encoding to Plex-friendly format...")
-                plex_file = output_file.parent / f"{output_file.stem}_plex{output_file.suffix}"
+                report('encoding')
+                plex_file = scratch.path(
+                    f"{output_file.stem}_plex{output_file.suffix}",
+                    estimate_reencoded_size(output_file)
+                )
                 
-                if reencode_to_plex_friendly(output_file, plex_file):
+                if reencode_to_plex_friendly(output_file, plex_file, params.get('deadline')):
                     # Use re-encoded file and delete original
                     output_file.unlink()
                     output_file = plex_file
                 else:
-                    return jsonify({'error': 'Plex re-encoding failed'}), 500
+                    raise PipelineError('Plex re-encoding failed')
             else:
                 print("Video is already Plex-friendly!")
         
-        print(f"Sending file: {output_file}")
+        # Every output must be playable while it is still downloading
+        report('finalizing')
+        if not ensure_progressive(output_file, fragmented):
+            raise PipelineError('Faststart remux failed')
         
-        # Send file to client
-        def cleanup_file():
-            """Cleanup file after sending"""
-            try:
-                time.sleep(1)  # Give time for download to complete
-                if output_file.exists():
-                    output_file.unlink()
-                    print(f"Cleaned up: {output_file}")
-            except Exception as e:
-                print(f"Cleanup error: {e}")
-        
-        response = send_file(
-            output_file,
-            as_attachment=True,
-            download_name=output_file.name,
-            mimetype='video/mp4'
+        return OUTPUTS.add(output_file, key)
+
+def run_clips_pipeline(params, report=no_report):
+    """
+    Download a video once and cut several clips from it into a zip
+
+    Returns:
+        (entry_id, output_file) of the retained output
+    """
+    url = params['url']
+    quality = params['quality']
+    ranges = [tuple(r) for r in params['ranges']]
+    plex_compatible = params['plex_compatible']
+
+    print(f"Clips request: URL={url}, Quality={quality}, Clips={ranges}, Plex={plex_compatible}")
+
+    key = request_key('clips', canonical_source(url), quality, ranges, plex_compatible)
+    cached = OUTPUTS.lookup(key)
+    if cached:
+        print("Serving retained output")
+        return cached
+
+    with new_scratch_space() as scratch:
+        # Download the source once for all clips
+        print("Downloading video...")
+        report('downloading')
+        video_file, _ = download_youtube_video_with_info(
+            url, quality, scratch.disk_dir, download_progress_hook(report)
         )
-        
-        # Schedule cleanup (note: this won't work perfectly with send_file)
-        # We'll do a simpler approach - cleanup in background
-        import threading
-        threading.Timer(2.0, cleanup_file).start()
-        
+
+        if not video_file.exists():
+            raise PipelineError('Download failed')
+
+        # Stream copy keeps the source codecs, so one check covers every clip
+        report('checking')
+        needs_reencode = plex_compatible and not is_plex_friendly(video_file)
+
+        report('trimming')
+        clips_size = sum(estimate_trimmed_size(video_file, start, end) for start, end in ranges)
+        if needs_reencode:
+            clips_size = int(clips_size * 2.5)  # clips and their re-encodes coexist briefly
+        clip_files = cut_clips(video_file, ranges, scratch.dir_for(clips_size))
+        video_file.unlink()
+        if not clip_files:
+            raise PipelineError('Trimming failed')
+
+        if needs_reencode:
+            print("Re-encoding clips to Plex-friendly format...")
+            report('encoding')
+            clip_files = reencode_files_to_plex_friendly(clip_files)
+            if clip_files is None:
+                raise PipelineError('Plex re-encoding failed')
+
+        report('finalizing')
+        if not all(ensure_progressive(f) for f in clip_files):
+            raise PipelineError('Faststart remux failed')
+
+        zip_size = sum(f.stat().st_size for f in clip_files)
+        zip_file = bundle_zip(clip_files, scratch.path(f"{video_file.stem}_clips.zip", zip_size))
+        return OUTPUTS.add(zip_file, key)
+
+def run_chapters_pipeline(params, report=no_report):
+    """
+    Download a video and split it into one file per chapter, zipped
+
+    Returns:
+        (entry_id, output_file) of the retained output
+    """
+    url = params['url']
+    quality = params['quality']
+    plex_compatible = params['plex_compatible']
+
+    print(f"Chapters request: URL={url}, Quality={quality}, Plex={plex_compatible}")
+
+    key = request_key('chapters', canonical_source(url), quality, plex_compatible)
+    cached = OUTPUTS.lookup(key)
+    if cached:
+        print("Serving retained output")
+        return cached
+
+    with new_scratch_space() as scratch:
+        print("Downloading video...")
+        report('downloading')
+        video_file, info = download_youtube_video_with_info(
+            url, quality, scratch.disk_dir, download_progress_hook(report)
+        )
+
+        if not video_file.exists():
+            raise PipelineError('Download failed')
+
+        chapters = info.get('chapters') or get_chapters(video_file)
+        if not chapters:
+            raise PipelineError('Video has no chapters', 400)
+
+        report('checking')
+        needs_reencode = plex_compatible and not is_plex_friendly(video_file)
+
+        # Parts get their own folder so chapter names can't clash with anything else
+        report('splitting')
+        parts_size = video_file.stat().st_size
+        if needs_reencode:
+            parts_size = int(parts_size * 2.5)
+        parts_dir = scratch.dir_for(parts_size) / 'chapters'
+        part_files = split_by_chapters(video_file, chapters, parts_dir)
+        video_file.unlink()
+        if not part_files:
+            raise PipelineError('Splitting failed')
+
+        if needs_reencode:
+            print("Re-encoding chapters to Plex-friendly format...")
+            report('encoding')
+            part_files = reencode_files_to_plex_friendly(part_files)
+            if part_files is None:
+                raise PipelineError('Plex re-encoding failed')
+
+        report('finalizing')
+        if not all(ensure_progressive(f) for f in part_files):
+            raise PipelineError('Faststart remux failed')
+
+        zip_size = sum(f.stat().st_size for f in part_files)
+        zip_file = bundle_zip(part_files, scratch.path(f"{video_file.stem}_chapters.zip", zip_size))
+        return OUTPUTS.add(zip_file, key)
+
+def run_hls_pipeline(params, report=no_report):
+    """
+    Download a video and encode it (or a trimmed part) to HLS for playback
+
+    The playlist entry is announced through `report` as soon as the first
+    segment is written, so playback can start while encoding continues.
+
+    Returns:
+        (entry_id, playlist) of the retained output
+    """
+    url = params['url']
+    quality = params['quality']
+    start_time = params['start_time']
+    end_time = params['end_time']
+
+    print(f"HLS request: URL={url}, Quality={quality}, Start={start_time}, End={end_time}")
+
+    key = request_key('hls', canonical_source(url), quality, start_time, end_time, bool(download_section(params)))
+    cached = OUTPUTS.lookup(key)
+    if cached:
+        print("Serving retained output")
+        return cached
+
+    with new_scratch_space() as scratch:
+        print("Downloading video...")
+        report('downloading')
+        section = download_section(params)
+        video_file, _ = download_youtube_video_with_info(
+            url, quality, scratch.disk_dir, download_progress_hook(report), section
+        )
+        if not video_file.exists():
+            raise PipelineError('Download failed')
+        if section:
+            # Already cut to the range
+            start_time = end_time = None
+
+        duration = get_video_duration(video_file) or 0
+        end = end_time if end_time is not None else duration
+        if duration:
+            end = min(end, duration)
+        length = max(end - (start_time or 0), 0)
+        width, height = get_video_size(video_file)
+
+        entry_id, entry_dir = OUTPUTS.reserve(HLS_PLAYLIST, extra={'kind': 'hls'})
+
+        def on_segment(count):
+            progress = min(round(100 * count * HLS_SEGMENT_SECONDS / length, 1), 99) if length else None
+            report('streaming', progress, entry_id=entry_id, filename=HLS_PLAYLIST)
+
+        with encode_slot() as queue_depth:
+            # Viewers start before the encode ends, so it has to keep up with realtime
+            preset, crf = choose_encoding(length, width, height, queue_depth, deadline=length)
+            print(f"🎛️ Encode policy: preset={preset}, crf={crf} (other encodes running: {queue_depth})")
+            report('encoding')
+            encoded = encode_hls(video_file, entry_dir, start_time, end_time, preset, crf, on_segment)
+
+        if not encoded:
+            OUTPUTS.discard(entry_id)
+            raise PipelineError('HLS encoding failed')
+        OUTPUTS.commit(entry_id, key)
+        return entry_id, entry_dir / HLS_PLAYLIST
+
+def run_preview_pipeline(params, report=no_report):
+    """
+    Download the smallest rendition of a video to scrub for trim points
+
+    The chosen range is then fetched in full quality by a download job with
+    section downloading, instead of downloading the whole video to try a cut.
+
+    Returns:
+        (entry_id, output_file) of the retained output
+    """
+    url = params['url']
+
+    print(f"Preview request: URL={url}")
+
+    key = request_key('preview', canonical_source(url))
+    cached = OUTPUTS.lookup(key)
+    if cached:
+        print("Serving retained output")
+        return cached
+
+    with new_scratch_space() as scratch:
+        print("Downloading preview...")
+        report('downloading')
+        video_file, _ = download_youtube_video_with_info(
+            url, download_path=scratch.disk_dir, progress_hook=download_progress_hook(report),
+            format_string=PREVIEW_FORMAT
+        )
+        if not video_file.exists():
+            raise PipelineError('Download failed')
+
+        # The player seeks with range requests, which needs the index up front
+        report('finalizing')
+        if not ensure_progressive(video_file):
+            raise PipelineError('Faststart remux failed')
+        return OUTPUTS.add(video_file, key)
+
+# Job kind -> (parameter parser, pipeline)
+PIPELINES = {
+    'download': (parse_download_params, run_download_pipeline),
+    'clips': (parse_clips_params, run_clips_pipeline),
+    'chapters': (parse_chapters_params, run_chapters_pipeline),
+    'hls': (parse_hls_params, run_hls_pipeline),
+    'preview': (parse_preview_params, run_preview_pipeline),
+}
+
+def upstream_error_response(e):
+    """Map a governed upstream failure to a client error instead of a generic 500"""
+    print(f"Upstream error ({e.kind}): {e}")
+    if e.kind == FATAL:
+        return jsonify({'error': str(e), 'retryable': False}), 422
+    response = jsonify({'error': str(e), 'retryable': True})
+    response.status_code = 503
+    if e.retry_after:
+        response.headers['Retry-After'] = str(int(e.retry_after) + 1)
+    return response
+
+def run_on_workers(kind, params):
+    """
+    Queue a pipeline for the workers and wait for its output
+
+    Returns:
+        (entry_id, output_file) like the pipeline itself
+    """
+    job = JOBS.submit(kind, params, lane=INTERACTIVE, estimate=lambda params: estimate_job_cost(kind, params))
+    claim_deadline = time.monotonic() + QUEUE_CLAIM_TIMEOUT
+    while True:
+        time.sleep(QUEUE_POLL_INTERVAL)
+        job = JOBS.get(job.id)
+        if job.status == QUEUED and time.monotonic() > claim_deadline:
+            # No worker running, or all of them busy: give up unless one just took it
+            if JOBS.withdraw(job.id, 'No worker picked up the job'):
+                raise PipelineError('No worker picked up the job in time', 503)
+            continue
+        if job.status == FAILED:
+            raise PipelineError(job.error or 'Job failed')
+        if job.status == DONE:
+            output_file = OUTPUTS.get(job.entry_id)
+            if output_file is None:
+                raise PipelineError('Output was removed before it could be sent')
+            return job.entry_id, output_file
+
+def serve_pipeline(kind):
+    """
+    Run a pipeline for the request and send its output
+
+    In worker mode (JOB_QUEUE_DB set) the pipeline runs on a worker and the
+    request only waits for it; otherwise it runs inside the request.
+    """
+    parse_params, run_pipeline = PIPELINES[kind]
+    meter = ResourceMeter(kind=kind)
+    status = 'error'
+
+    def report(stage, progress=None, **fields):
+        meter.enter(stage)
+
+    try:
+        params = parse_params(request.args)
+        if JOB_QUEUE_DB:
+            return send_output(*run_on_workers(kind, params))
+        # Only worth a preflight when the request has to queue behind others
+        cost = estimate_job_cost(kind, params) if PIPELINE_GATE.busy() else None
+        with PIPELINE_GATE.slot(cost, INTERACTIVE), metering(meter):
+            response = send_output(*run_pipeline(params, report))
+        status = 'done'
         return response
-        
+    except PipelineError as e:
+        return jsonify({'error': str(e)}), e.status
+    except UpstreamError as e:
+        return upstream_error_response(e)
     except Exception as e:
-        print(f"Error in download endpoint: {e}")
+        print(f"Error in {kind} endpoint: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
+    finally:
+        if meter.children:
+            log_usage(meter, status, {'url': request.args.get('url')})
+
+@app.route('/api/download')
+def download():
+    """Download endpoint - handles video download and trimming"""
+    return serve_pipeline('download')
+
+@app.route('/api/clips')
+def download_clips():
+    """Clips endpoint - downloads a video once and cuts several clips from it"""
+    return serve_pipeline('clips')
+
+@app.route('/api/chapters')
+def download_chapters():
+    """Chapters endpoint - downloads a video and splits it into one file per chapter"""
+    return serve_pipeline('chapters')
+
+@app.route('/api/preview')
+def download_preview():
+    """Preview endpoint - sends a small low-resolution copy for picking trim points"""
+    return serve_pipeline('preview')
+
+def job_status(job):
+    """Job dict plus the link to its result once finished"""
+    status = job.to_dict()
+    if job.entry_id:
+        status['file_url'] = url_for('get_output', entry_id=job.entry_id)
+        if job.kind == 'hls':
+            status['playlist_url'] = url_for('get_hls', entry_id=job.entry_id, name=HLS_PLAYLIST)
+    return status
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Start a pipeline in the background and return its job id"""
+    args = request.get_json(silent=True) or request.values
+    kind = args.get('kind', 'download')
+    if kind not in PIPELINES:
+        return jsonify({'error': f'Unknown job kind: {kind}'}), 400
+
+    lane = args.get('lane', INTERACTIVE)
+    if lane not in LANES:
+        return jsonify({'error': f'Unknown lane: {lane}'}), 400
+
+    parse_params, run_pipeline = PIPELINES[kind]
+    try:
+        params = parse_params(args)
+    except PipelineError as e:
+        return jsonify({'error': str(e)}), e.status
+
+    job = JOBS.submit(kind, params, run_pipeline, lane=lane,
+                      estimate=lambda params: estimate_job_cost(kind, params))
+    response = jsonify(job_status(job))
+    response.status_code = 202
+    response.headers['Location'] = url_for('get_job', job_id=job.id)
+    return response
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Job status and progress"""
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_status(job))
+
+@app.route('/api/jobs/<job_id>/file')
+def get_job_file(job_id):
+    """Redirect to a finished job's output"""
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if not job.entry_id:
+        return jsonify({'error': 'Job not finished', 'status': job.status}), 409
+    return redirect(url_for('get_output', entry_id=job.entry_id))
+
+@app.route('/api/files/<entry_id>')
+def get_output(entry_id):
+    """Serve a retained output by id (supports Range and conditional requests)"""
+    output_file = OUTPUTS.get(entry_id)
+    if output_file is None:
+        return jsonify({'error': 'File not found or expired'}), 404
+    return send_output(entry_id, output_file)
+
+@app.route('/api/hls/<entry_id>/<name>')
+def get_hls(entry_id, name):
+    """Serve an HLS playlist or segment, including ones still being encoded"""
+    path = OUTPUTS.member(entry_id, name)
+    if path is None or path.suffix not in HLS_CONTENT_TYPES:
+        return jsonify({'error': 'File not found or expired'}), 404
+    response = send_file(path, mimetype=HLS_CONTENT_TYPES[path.suffix], conditional=True)
+    if path.suffix == '.m3u8':
+        # The playlist grows while encoding; segments never change once listed
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/health')
 def health():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'service': 'YouTube Downloader'})
+    return jsonify({
+        'status': 'healthy',
+        'service': 'YouTube Downloader',
+        'upstream': GOVERNOR.snapshot(),
+        'scheduler': PIPELINE_GATE.snapshot()
+    })
 
 if __name__ == "__main__":
     print("🚀 Starting YouTube Downloader Web Server...")
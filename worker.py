@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Pipeline Worker
+Pulls jobs from the shared queue and runs them
+
+Run any number of these (in one or many containers) against the same queue
+database and output volume; the web app then only submits jobs.
+
+Usage: python worker.py [--db PATH] [--concurrency N] [--lanes interactive,batch]
+"""
+
+import argparse
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from accounting import ResourceMeter, metering, log_usage
+from job_queue import SqliteJobQueue
+from jobs import JOB_WORKERS
+from governor import UpstreamError
+
+POLL_INTERVAL = float(os.environ.get('WORKER_POLL_SECONDS', '2'))
+
+
+class Heartbeat:
+    """Keeps a job's lease alive from a background thread while it runs"""
+
+    def __init__(self, queue, job_id, worker_id):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.queue.lease / 3):
+            if not self.queue.heartbeat(self.job_id, self.worker_id):
+                print(f"⚠️ Lost lease on job {self.job_id}")
+                self.lost = True
+                return
+
+
+def run_job(queue, job, worker_id):
+    """Run one claimed job and record its result in the queue"""
+    # Imported here so a worker starts polling without paying for Flask until needed
+    from web_app import PIPELINES, PipelineError
+
+    print(f"▶️ {worker_id} running {job.kind} job {job.id}")
+    meter = ResourceMeter(job.id, job.kind)
+    status = 'error'
+
+    def report(stage, progress=None, **fields):
+        meter.enter(stage)
+        queue.update(job.id, stage=stage, progress=progress, resources=meter.to_dict(), **fields)
+
+    with Heartbeat(queue, job.id, worker_id) as heartbeat, metering(meter):
+        try:
+            _, run_pipeline = PIPELINES[job.kind]
+            entry_id, output_file = run_pipeline(job.params, report)
+            status = 'done'
+        except PipelineError as e:
+            # Bad input won't get better on another worker; server-side failures might
+            queue.fail(job.id, worker_id, str(e), retry=e.status >= 500)
+            print(f"❌ Job {job.id} failed: {e}")
+            return
+        except UpstreamError as e:
+            queue.fail(job.id, worker_id, str(e), retry=e.retryable)
+            print(f"❌ Job {job.id} failed upstream ({e.kind}): {e}")
+            return
+        except Exception as e:
+            traceback.print_exc()
+            queue.fail(job.id, worker_id, str(e), retry=True)
+            print(f"❌ Job {job.id} failed: {e}")
+            return
+        finally:
+            if not heartbeat.lost:
+                queue.update(job.id, resources=meter.to_dict())
+            log_usage(meter, status, {'params': job.params, 'worker': worker_id})
+
+    if heartbeat.lost:
+        print(f"⚠️ Job {job.id} finished after its lease moved to another worker")
+        return
+    queue.complete(job.id, worker_id, entry_id, output_file.name)
+    print(f"✅ Job {job.id} done: {output_file.name}")
+
+
+def worker_loop(queue, worker_id, stop, lanes=None):
+    """Claim and run jobs until `stop` is set"""
+    while not stop.is_set():
+        try:
+            job = queue.claim(worker_id, lanes)
+        except Exception as e:
+            print(f"⚠️ Could not claim a job: {e}")
+            job = None
+        if job is None:
+            stop.wait(POLL_INTERVAL)
+            continue
+        run_job(queue, job, worker_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run pipeline jobs from the shared queue')
+    parser.add_argument('--db', default=os.environ.get('JOB_QUEUE_DB', '/downloads/.queue/jobs.db'),
+                        help='Queue database (default: $JOB_QUEUE_DB or /downloads/.queue/jobs.db)')
+    parser.add_argument('--concurrency', '-c', type=int, default=JOB_WORKERS,
+                        help='Jobs to run at the same time (default: $JOB_WORKERS or 2, like the web app)')
+    parser.add_argument('--lanes', default=os.environ.get('WORKER_LANES', ''),
+                        help='Comma-separated lanes to take jobs from, e.g. interactive (default: all)')
+    args = parser.parse_args()
+    lanes = [lane.strip() for lane in args.lanes.split(',') if lane.strip()]
+
+    queue = SqliteJobQueue(args.db)
+    base_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    stop = threading.Event()
+
+    print(f"🚀 Worker {base_id} polling {args.db} with {args.concurrency} slots"
+          f" ({', '.join(lanes) if lanes else 'all lanes'})")
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for slot in range(args.concurrency):
+            pool.submit(worker_loop, queue, f"{base_id}-{slot}", stop, lanes)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("\n⏹️ Stopping worker after running jobs finish")
+            stop.set()
+
+
+if __name__ == "__main__":
+    main()